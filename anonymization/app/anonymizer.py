@@ -1,27 +1,91 @@
-import os
 import re
 import uuid
-import psycopg2
 import logging
-from presidio_analyzer import AnalyzerEngine, RecognizerResult, Pattern, PatternRecognizer
+from datetime import datetime, timezone
+from presidio_analyzer import AnalyzerEngine
 from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine
+from .config import (
+    DATABASE_URL, DB_POOL_HEALTH_CHECK_INTERVAL, DB_POOL_MAX_SIZE, DB_POOL_MAX_USES, DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT, ENTITY_PRIORITY, MAPPING_RETENTION_DAYS, NAME_GAZETTEER_PATH, NLP_BATCH_SIZE,
+    PRESIDIO_HOSTED_DETECTORS, SESSION_CACHE_MAX_TOKENS, SESSION_CACHE_SIZE, SPAN_CACHE_MAX_BYTES, TOKEN_BLOCK_SIZE,
+    TOKEN_HMAC_KEY, TOKEN_HMAC_LENGTH, TOKEN_LENGTH, TOKEN_MODE, TOKEN_PREFIX, TOKEN_TENANT, TOKEN_VAULT_BATCH_SIZE,
+    TOKEN_VAULT_ENABLED, TOKEN_VAULT_FLUSH_INTERVAL, TOKEN_VAULT_MAX_PENDING, TRIAGE_ENABLED
+)
+from .db import ConnectionPool
+from .detection import DetectionEngine, DetectionPipeline, PatternDetector, TriageCounters
+from .gazetteer import Gazetteer, GazetteerDetector, load_gazetteer_file
+from .normalization import NormalizedText, normalize_streets
+from .pseudonyms import KeyedTokens, TokenVault
+from .sessions import SessionRegistry
+from .span_cache import SpanCache, detector_config_version
+from .spans import resolve_overlaps, rewrite_spans
+from .tokens import TokenAllocator, token_regex
 
 # Konfiguracja logowania
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Konfiguracja bazy danych
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://anon_user:securepassword@db/anon_db")
+# Pula połączeń z bazą danych (rozmiar i limity z zmiennych środowiskowych, patrz config.py)
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_uses=DB_POOL_MAX_USES,
+    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+)
+
+# Rejestr sesji (moment otwarcia sesji = created_at jej mapowań) z pamięcią podręczną tokenów sesji
+session_registry = SessionRegistry(
+    max_cached=SESSION_CACHE_SIZE,
+    retention_days=MAPPING_RETENTION_DAYS,
+    max_tokens_per_session=SESSION_CACHE_MAX_TOKENS,
+)
+
+# Tryb hmac: tokeny deterministyczne bez zapisu mapowań sesji; opcjonalny sejf z zapisem odroczonym
+keyed_tokens = KeyedTokens(
+    TOKEN_HMAC_KEY.encode("utf-8"), TOKEN_TENANT, prefix=TOKEN_PREFIX, length=TOKEN_HMAC_LENGTH
+) if TOKEN_MODE == "hmac" else None
+token_vault = TokenVault(
+    db_pool, TOKEN_TENANT,
+    interval=TOKEN_VAULT_FLUSH_INTERVAL,
+    batch_size=TOKEN_VAULT_BATCH_SIZE,
+    max_pending=TOKEN_VAULT_MAX_PENDING,
+) if keyed_tokens and TOKEN_VAULT_ENABLED else None
 
 def get_db_connection():
-    """Nawiązuje połączenie z bazą danych."""
+    """Pobiera połączenie z puli."""
     try:
-        return psycopg2.connect(DATABASE_URL)
+        return db_pool.getconn()
     except Exception as e:
         logger.error("Błąd połączenia z bazą danych: %s", e)
         raise
 
+def release_db_connection(conn):
+    """Zwraca połączenie do puli (połączenia spoza puli są zamykane)."""
+    db_pool.putconn(conn)
+
+def reserve_token_ids(count: int) -> list:
+    """Rezerwuje `count` identyfikatorów tokenów z sekwencji bazy jednym zapytaniem."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT nextval('anon_token_seq') FROM generate_series(1, %s)", (count,))
+            ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        return ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+# Tokeny bez kolizji z bloków sekwencji rezerwowanych przez proces
+token_allocator = TokenAllocator(
+    reserve_token_ids, block_size=TOKEN_BLOCK_SIZE, prefix=TOKEN_PREFIX, length=TOKEN_LENGTH
+)
+
 # Konfiguracja NLP (dla języka niemieckiego)
 NLP_CONFIG = {
     "nlp_engine_name": "spacy",
@@ -88,6 +152,10 @@ STREET_REGEX = (
     r"(Straße|Weg|Platz|Allee|Ring|Gasse|Damm|Steig|Ufer|Hof|Chaussee)\s\d+(?!\w)"
 )
 
+# Kształt tokenu anonimizacji: TOKEN_PREFIX + TOKEN_LENGTH znaków (np. anno_g0000001)
+# albo TOKEN_HMAC_LENGTH znaków (tokeny hmac)
+TOKEN_REGEX = token_regex(TOKEN_PREFIX, TOKEN_LENGTH, TOKEN_HMAC_LENGTH)
+
 # Lista popularnych niemieckich imion
 GERMAN_NAMES = [
     # Imiona zaczynające się na E
@@ -102,216 +170,311 @@ GERMAN_NAMES = [
     "Jan", "Lukas", "Felix", "Maximilian", "Paul", "Florian", "David", "Tim", "Jonas", "Niklas"
 ]
 
-# Regex dla imion
-NAME_REGEX = r"\b(?:" + "|".join(GERMAN_NAMES) + r")\b"
+# Słownik imion budowany raz przy starcie (lista wbudowana + opcjonalny plik ze słownikiem)
+name_gazetteer = Gazetteer(GERMAN_NAMES + load_gazetteer_file(NAME_GAZETTEER_PATH))
+
+# Liczniki triage: pominięte detektory, analizator NLP i normalizacja (patrz /admin/triage)
+triage_counters = TriageCounters()
+
+# Każda z normalizacji nazw ulic wymaga jednego z tych fragmentów (skrótu lub przyrostka ulicy)
+STREET_HINT = re.compile(r"str|pl|al|weg|ring|gasse|damm|steig|ufer|hof|chaussee", re.IGNORECASE)
+
+def normalize_text(text: str) -> NormalizedText:
+    """Znormalizowany widok tekstu do detekcji (nazwy ulic) z mapą przesunięć do oryginału."""
+    if TRIAGE_ENABLED:
+        if not STREET_HINT.search(text):
+            triage_counters.record(skipped=["NORMALIZATION"])
+            return NormalizedText(text)
+        triage_counters.record(ran=["NORMALIZATION"])
+    return normalize_streets(text)
+
+# Własne detektory (kolejność = kolejność wyników). triage – warunek konieczny dopasowania
+# (np. minimalna liczba cyfr we wzorcu); detektor jest pomijany, gdy tekst go nie spełnia
+CUSTOM_DETECTORS = [
+    PatternDetector("ZIP_CODE", ZIP_CODE_REGEX, 1.0, triage=lambda f: f.digits >= 5),
+    PatternDetector("DATE", DATE_REGEX, 1.0, triage=lambda f: f.digits >= 4 and (f.has_month or f.has_separator)),
+    PatternDetector("CREDIT_CARD", CREDIT_CARD_REGEX, 1.0, triage=lambda f: f.digits >= 12),
+    PatternDetector("TAX_ID", TAX_ID_REGEX, 1.0, triage=lambda f: f.digits >= 10),
+    PatternDetector("STREET", STREET_REGEX, 1.5, triage=lambda f: f.digits >= 1 and f.has_letter),
+    PatternDetector("PHONE_NUMBER", PHONE_NUMBER_REGEX, 1.0, triage=lambda f: f.digits >= 8),
+    PatternDetector("LICENSE_PLATE", LICENSE_PLATE_REGEX, 1.0, triage=lambda f: f.digits >= 1 and f.has_letter),
+    GazetteerDetector("PERSON", name_gazetteer, 0.95),  # Zwiększamy priorytet rozpoznawania imion
+]
 
-# Rejestracja własnych detektorów w analizatorze Presidio
-def detect_names(text: str) -> list:
-    """Wykrywa imiona w tekście przy użyciu wzorca regex."""
-    results = []
-    for name in GERMAN_NAMES:
-        # Szukamy dokładnych dopasowań imion
-        for match in re.finditer(r'\b' + re.escape(name) + r'\b', text):
-            start = match.start()
-            end = match.end()
-            results.append(
-                RecognizerResult(
-                    entity_type="PERSON",
-                    start=start,
-                    end=end,
-                    score=0.95
-                )
-            )
-    return results
-
-def register_custom_recognizers():
-    custom_entities = [
-        ("ZIP_CODE", ZIP_CODE_REGEX, 1.0),
-        ("DATE", DATE_REGEX, 1.0),
-        ("CREDIT_CARD", CREDIT_CARD_REGEX, 1.0),
-        ("TAX_ID", TAX_ID_REGEX, 1.0),
-        ("PHONE_NUMBER", PHONE_NUMBER_REGEX, 1.0),
-        ("STREET", STREET_REGEX, 1.5),
-        ("LICENSE_PLATE", LICENSE_PLATE_REGEX, 1.0),
-        ("PERSON", NAME_REGEX, 0.95)  # Zwiększamy priorytet rozpoznawania imion
-    ]
-    for entity, regex, score in custom_entities:
-        pattern = Pattern(name=entity, regex=regex, score=score)
-        recognizer = PatternRecognizer(supported_entity=entity, patterns=[pattern])
-        analyzer.registry.add_recognizer(recognizer)
-
-register_custom_recognizers()
-
-# Funkcje normalizujące nazwy ulic
-def expand_street_abbreviations(text: str) -> str:
-    """Rozszerza skróty nazw ulic, np. 'Str.' na 'Straße'."""
-    abbreviations = {
-        r"\bStr\.\b": "Straße",
-        r"\bPl\.\b": "Platz",
-        r"\bAl\.\b": "Allee",
-        r"\bStr\b": "Straße",
-        r"\bPl\b": "Platz",
-        r"\bAl\b": "Allee"
-    }
-    for abbr, full_form in abbreviations.items():
-        text = re.sub(rf"(\b[A-ZÄÖÜa-zäöüß-]+\b)[-\s]?{abbr}", rf"\1 {full_form}", text)
-    return text
-
-def preprocess_street_names(text: str) -> str:
-    """
-    Dzieli złożone nazwy ulic, np. 'Hauptstraße' → 'Haupt straße', ale nie modyfikuje
-    nazw zawierających myślnik tuż przed przyrostkiem (np. 'Werner-von-Siemens-Straße' pozostaje niezmienione).
-    """
-    street_patterns = [
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(straße)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(Straße)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(weg)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(platz)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(allee)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(gasse)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(ring)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(damm)\b",
-        r"\b([A-ZÄÖÜa-zäöüß-]+)(ufer)\b",
-    ]
-    for pattern in street_patterns:
-        text = re.sub(
-            pattern,
-            lambda m: m.group(1) + ("" if m.group(1).endswith('-') else " ") + m.group(2),
-            text
-        )
-    return text
-
-def normalize_hyphenated_streets(text: str) -> str:
-    return re.sub(
-        r"\b((?:[A-ZÄÖÜa-zäöüß]+-?)+)-(Straße|Weg|Platz|Allee|Ring|Gasse|Damm|Steig|Ufer|Hof|Chaussee)\b",
-        lambda m: f"{m.group(1).replace('-', ' ')} {m.group(2)}".replace("  ", " "),
-        text
-    ).strip()
-
-def normalize_street_names(text: str) -> str:
-    """Dodatkowa normalizacja nazw ulic z myślnikami."""
-    return re.sub(
-        r"(\b[A-ZÄÖÜa-zäöüß]+)-([A-ZÄÖÜa-zäöüß]+)-([A-ZÄÖÜa-zäöüß]+)\s"
-        r"(Straße|straße|Weg|Platz|Allee|Ring|Gasse|Damm|Steig|Ufer|Hof|Chaussee)\s\d+",
-        r"\1 \2 \3 \4",
-        text
+# Wszystkie detektory w jednym silniku – używany przez funkcje detect_* niezależnie od konfiguracji potoku
+detection_engine = DetectionEngine(CUSTOM_DETECTORS)
+
+# Rejestracja własnych detektorów – każdy działa dokładnie raz: natywnie albo w analizatorze Presidio
+detection_pipeline = DetectionPipeline(
+    analyzer, CUSTOM_DETECTORS, presidio_hosted=PRESIDIO_HOSTED_DETECTORS,
+    triage=TRIAGE_ENABLED, counters=triage_counters,
+)
+
+def current_detector_version() -> str:
+    """Wersja konfiguracji detekcji: detektory, słownik imion, recognizery analizatora i reguły rozwiązywania konfliktów."""
+    return detector_config_version(
+        [(d.entity_type, getattr(d, "regex", None), d.score) for d in CUSTOM_DETECTORS],
+        NAME_GAZETTEER_PATH, len(name_gazetteer),
+        sorted(r.name for r in analyzer.registry.recognizers),
+        NLP_CONFIG, ENTITY_PRIORITY, sorted(IGNORED_PHRASES),
     )
 
+# Wyniki detekcji powtarzających się tekstów (bez tokenów – wpisy niezależne od sesji)
+span_cache = SpanCache(SPAN_CACHE_MAX_BYTES, current_detector_version())
+
+def invalidate_span_cache() -> dict:
+    """Czyści pamięć wyników detekcji po zmianie recognizerów lub słowników i zwraca jej statystyki."""
+    span_cache.invalidate(current_detector_version())
+    return span_cache.stats()
+
 # Uniwersalna funkcja detekcji przy użyciu wyrażenia regularnego
 def detect_pattern(regex: str, text: str, entity_type: str, score: float) -> list:
-    results = []
-    # Używamy flagi IGNORECASE, aby wychwycić wszystkie warianty (np. "Straße" i "straße")
-    for match in re.finditer(regex, text, flags=re.IGNORECASE):
-        logger.debug("Wykryto %s: %s", entity_type, match.group())
-        results.append(RecognizerResult(start=match.start(), end=match.end(), entity_type=entity_type, score=score))
-    return results
+    return PatternDetector(entity_type, regex, score).detect(text)
 
 def detect_zip_code(text: str) -> list:
-    return detect_pattern(ZIP_CODE_REGEX, text, "ZIP_CODE", 1.0)
+    return detection_engine.detect_entity("ZIP_CODE", text)
 
 def detect_dates(text: str) -> list:
-    return detect_pattern(DATE_REGEX, text, "DATE", 1.0)
+    return detection_engine.detect_entity("DATE", text)
 
 def detect_credit_cards(text: str) -> list:
-    return detect_pattern(CREDIT_CARD_REGEX, text, "CREDIT_CARD", 1.0)
+    return detection_engine.detect_entity("CREDIT_CARD", text)
 
 def detect_tax_id(text: str) -> list:
-    return detect_pattern(TAX_ID_REGEX, text, "TAX_ID", 1.0)
+    return detection_engine.detect_entity("TAX_ID", text)
 
 def detect_phone_numbers(text: str) -> list:
-    return detect_pattern(PHONE_NUMBER_REGEX, text, "PHONE_NUMBER", 1.0)
+    return detection_engine.detect_entity("PHONE_NUMBER", text)
 
 def detect_street(text: str) -> list:
-    return detect_pattern(STREET_REGEX, text, "STREET", 1.5)
+    return detection_engine.detect_entity("STREET", text)
 
 def detect_license_plates(text: str) -> list:
-    return detect_pattern(LICENSE_PLATE_REGEX, text, "LICENSE_PLATE", 1.0)
+    return detection_engine.detect_entity("LICENSE_PLATE", text)
+
+def detect_names(text: str) -> list:
+    """Wykrywa imiona w tekście przy użyciu słownika (jedno przejście niezależnie od liczby imion)."""
+    return detection_engine.detect_entity("PERSON", text)
 
 # Klasa odpowiadająca za proces anonimizacji oraz deanonimizacji
 class AnonymizationService:
     def __init__(self):
         self.analyzer = analyzer
         self.anonymizer = anonymizer
+        self.pipeline = detection_pipeline
+        self.sessions = session_registry
+        self.span_cache = span_cache
+        self.keyed_tokens = keyed_tokens
+        self.allocator = token_allocator
+        self.vault = token_vault
+
+    def open_session(self, session_id: str = None) -> dict:
+        """
+        Otwiera sesję o podanym (lub nowym) identyfikatorze; dla istniejącej sesji zwraca jej dane.
+        W trybie hmac tokeny nie zależą od sesji – identyfikator jest zwracany bez zapisu do bazy.
+        """
+        if self.keyed_tokens is not None:
+            return {"session_id": session_id or str(uuid.uuid4()), "opened_at": datetime.now(timezone.utc).isoformat()}
+        conn = get_db_connection()
+        try:
+            session_id, opened_at = self.sessions.open(conn, session_id)
+            return {"session_id": session_id, "opened_at": opened_at.isoformat()}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db_connection(conn)
 
     def anonymize_text(self, session_id: str, text: str) -> str:
         """
         Anonimizuje tekst – wykrywa pola zawierające dane wrażliwe, zapisuje ich mapowanie
         w bazie oraz zastępuje oryginalne wartości tokenami.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            # Normalizacja tekstu przed detekcją
-            text = expand_street_abbreviations(text)
-            text = preprocess_street_names(text)
-            text = normalize_hyphenated_streets(text)
-            text = normalize_street_names(text)
-
-            # Detekcja za pomocą funkcji ręcznych
-            detected_results = []
-            detected_results += detect_zip_code(text)
-            detected_results += detect_dates(text)
-            detected_results += detect_credit_cards(text)
-            detected_results += detect_tax_id(text)
-            detected_results += detect_street(text)
-            detected_results += detect_phone_numbers(text)
-            detected_results += detect_license_plates(text)
-            detected_results += detect_names(text)  # Dodajemy bezpośrednią detekcję imion
-
-            # Detekcja przy użyciu silnika NLP
-            detected_results += self.analyzer.analyze(text=text, language="de")
-
-            # Mapowanie wykrytych encji na tokeny anonimowe.
-            # Używamy krotki (fragment, typ) jako klucza, aby rozróżnić te same frazy różnych typów.
-            entity_mapping = {}
-            for res in detected_results:
-                extracted_text = text[res.start:res.end]
-                if is_ignored(extracted_text):
-                    continue
-                key = (extracted_text, res.entity_type)
-                if key not in entity_mapping:
-                    anon_token = f"anno_{uuid.uuid4().hex[:8]}"
-                    entity_mapping[key] = anon_token
-                    cursor.execute(
-                        "INSERT INTO anonymization (session_id, anon_id, original_value, entity_type) VALUES (%s, %s, %s, %s)",
-                        (session_id, anon_token, extracted_text, res.entity_type)
-                    )
-                    conn.commit()
-
-            # Zamiana wykrytych fragmentów na tokeny – sortujemy po długości oryginalnego tekstu, by uniknąć konfliktów.
-            for (original_text, _), anon_token in sorted(entity_mapping.items(), key=lambda x: len(x[0][0]), reverse=True):
-                pattern = re.escape(original_text)
-                text = re.sub(pattern, anon_token, text)
-            return text
+            # Detekcja na znormalizowanym widoku: detektory natywne + silnik NLP (każdy detektor
+            # uruchamiany dokładnie raz); powtarzający się tekst – wynik z pamięci podręcznej, bez detekcji.
+            # Fragmenty przeliczane są na tekst oryginalny – tylko one są zmieniane.
+            spans = self.detect_spans([normalize_text(text)])[0]
+
+            # Tokeny sesji: znane wartości z pamięci podręcznej, nowe zapisywane jednym poleceniem;
+            # tekst bez wykrytych encji w ogóle nie korzysta z bazy.
+            tokens = self.tokens_for(session_id, {key for _, _, key in spans})
+
+            # Zamiana wykrytych fragmentów na tokeny w jednym przejściu po przesunięciach –
+            # zastępowane są tylko wykryte wystąpienia, a wstawione tokeny nie są modyfikowane.
+            return rewrite_spans(text, [(start, end, tokens[key]) for start, end, key in spans])
 
         except Exception as e:
             logger.error("Błąd podczas anonimizacji: %s", e)
             raise
-        finally:
-            cursor.close()
-            conn.close()
 
-    def deanonymize_text(self, session_id: str, text: str) -> str:
+    def anonymize_batch(self, session_id: str, texts: list) -> list:
+        """
+        Anonimizuje listę tekstów w ramach jednej sesji. Model NLP przetwarza teksty partiami,
+        te same wartości otrzymują ten sam token, a wszystkie nowe mapowania zapisywane są w jednej transakcji.
+        Wyniki zwracane są w kolejności tekstów.
+        """
+        try:
+            spans_batch = self.detect_spans([normalize_text(text) for text in texts])
+            tokens = self.tokens_for(session_id, {key for spans in spans_batch for _, _, key in spans})
+
+            return [
+                rewrite_spans(text, [(start, end, tokens[key]) for start, end, key in spans])
+                for text, spans in zip(texts, spans_batch)
+            ]
+
+        except Exception as e:
+            logger.error("Błąd podczas anonimizacji wsadowej: %s", e)
+            raise
+
+    def anonymize_entities(self, session_id: str, entities: list) -> list:
+        """
+        Zastępuje tokenami wartości o typie encji znanym z góry (np. z reguł ścieżek dokumentu) –
+        bez detekcji i modelu NLP. entities: lista (wartość, typ); wyniki w tej samej kolejności.
+        """
+        keys = [(text, entity_type) for text, entity_type in entities]
+        tokens = self.tokens_for(session_id, set(keys))
+        return [tokens[key] for key in keys]
+
+    def detect_spans(self, normalized_texts: list) -> list:
+        """
+        Zwraca fragmenty tekstu oryginalnego do zastąpienia [(start, end, (fragment, typ))]
+        dla każdego znormalizowanego tekstu (NormalizedText). Widoki znane z pamięci podręcznej
+        nie są analizowane; pozostałe (każdy różny widok raz) przechodzą przez potok detekcji –
+        pojedynczo albo partiami modelu NLP.
+        """
+        resolved = {}
+        missing = []
+        for text in dict.fromkeys(normalized.text for normalized in normalized_texts):
+            spans = self.span_cache.get(text)
+            if spans is None:
+                missing.append(text)
+            else:
+                resolved[text] = spans
+        if missing:
+            if len(missing) == 1:
+                detected_batch = [self.pipeline.analyze(missing[0])]
+            else:
+                detected_batch = self.pipeline.analyze_batch(missing, batch_size=NLP_BATCH_SIZE)
+            for text, detected_results in zip(missing, detected_batch):
+                spans = [(start, end, entity_type) for start, end, (_, entity_type) in self.resolve_entities(text, detected_results)]
+                self.span_cache.put(text, spans)
+                resolved[text] = spans
+        results = []
+        for normalized in normalized_texts:
+            spans = []
+            for start, end, entity_type in resolved[normalized.text]:
+                start, end = normalized.original_span(start, end)
+                spans.append((start, end, (normalized.original[start:end], entity_type)))
+            results.append(spans)
+        return results
+
+    def resolve_entities(self, text: str, detected_results: list) -> list:
+        """
+        Rozwiązuje konflikty nakładających się fragmentów (przed przydziałem tokenów i zapisem do bazy).
+        Zwraca listę (start, end, klucz), gdzie klucz = (fragment, typ) rozróżnia te same frazy różnych typów.
+        """
+        detected_results = [res for res in detected_results if not is_ignored(text[res.start:res.end])]
+        resolved_results = resolve_overlaps(detected_results, ENTITY_PRIORITY)
+        return [(res.start, res.end, (text[res.start:res.end], res.entity_type)) for res in resolved_results]
+
+    def tokens_for(self, session_id: str, keys: set) -> dict:
+        """
+        Zwraca tokeny sesji {(fragment, typ): token}. Wartość znana w sesji zachowuje swój token
+        (bez zapytania do bazy, gdy jest w pamięci podręcznej); nowe wartości otrzymują nowe tokeny.
+        W trybie hmac token wyliczany jest z wartości – bez bazy (mapowanie trafia najwyżej do sejfu).
+        """
+        if self.keyed_tokens is not None:
+            tokens = self.keyed_tokens.tokens(keys)
+            if self.vault is not None:
+                self.vault.add(tokens)
+            return tokens
+        tokens = self.sessions.cached_tokens(session_id, keys)
+        new_keys = [key for key in keys if key not in tokens]
+        new_mappings = dict(zip(new_keys, self.allocator.allocate(len(new_keys))))
+        if new_mappings:
+            tokens.update(self.save_mappings(session_id, new_mappings))
+        return tokens
+
+    def save_mappings(self, session_id: str, entity_mapping: dict) -> dict:
         """
-        Przywraca oryginalny tekst na podstawie danych zapisanych w bazie (odwrotność anonimizacji).
+        Zapisuje mapowania {(fragment, typ): token} jednym wielowierszowym INSERT-em w jednej transakcji
+        i zwraca tokeny obowiązujące w sesji – dla wartości zapisanej już wcześniej (np. przez inny proces)
+        jest to jej dotychczasowy token. Nieznana sesja jest otwierana niejawnie w tej samej transakcji
+        (wiersz sesji i mapowania zatwierdzane są jednym commitem); wiersze otrzymują created_at = moment
+        otwarcia sesji. Tokeny pochodzą z bloku sekwencji zarezerwowanego wcześniej (tokens_for) –
+        rezerwacja to osobne zapytanie raz na TOKEN_BLOCK_SIZE tokenów, nie przy każdym zapisie.
         """
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
+            session_id, opened_at = self.sessions.open(conn, session_id, commit=False)
+            rows = [
+                (session_id, anon_token, original_value, entity_type, opened_at)
+                for (original_value, entity_type), anon_token in entity_mapping.items()
+            ]
+            # DO UPDATE (bez zmiany wartości) zwraca istniejący token zamiast pomijać wiersz
             cursor.execute(
-                "SELECT anon_id, original_value FROM anonymization WHERE session_id = %s",
-                (session_id,)
+                "INSERT INTO anonymization (session_id, anon_id, original_value, entity_type, created_at) VALUES "
+                + ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+                + " ON CONFLICT (session_id, original_value, entity_type, created_at)"
+                " DO UPDATE SET anon_id = anonymization.anon_id"
+                " RETURNING original_value, entity_type, anon_id",
+                [value for row in rows for value in row]
             )
-            mappings = cursor.fetchall()
-            for anon_id, original_value in mappings:
-                text = re.sub(rf"\b{re.escape(anon_id)}\b", original_value, text)
-            return text
-        except Exception as e:
-            logger.error("Błąd podczas deanonimizacji: %s", e)
+            tokens = {(original_value, entity_type): anon_id for original_value, entity_type, anon_id in cursor.fetchall()}
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Wiersz sesji otwartej w tej transakcji również został wycofany
+            self.sessions.forget(session_id)
             raise
         finally:
             cursor.close()
-            conn.close()
+            release_db_connection(conn)
+        self.sessions.remember_tokens(session_id, tokens)
+        return tokens
+
+    def deanonymize_text(self, session_id: str, text: str) -> str:
+        """Przywraca oryginalny tekst na podstawie danych zapisanych w bazie (odwrotność anonimizacji)."""
+        return self.deanonymize_batch(session_id, [text])[0]
+
+    def deanonymize_batch(self, session_id: str, texts: list) -> list:
+        """
+        Przywraca oryginalne wartości w liście tekstów jednej sesji. Mapowania wszystkich tokenów
+        występujących w tekstach pobierane są jednym zapytaniem, ograniczonym do partycji
+        od momentu otwarcia sesji. W trybie hmac mapowania pochodzą z sejfu tokenów
+        (bez sejfu tokeny pozostają bez zmian). Wyniki w kolejności tekstów.
+        """
+        tokens = {token for text in texts for token in TOKEN_REGEX.findall(text)}
+        if not tokens:
+            return list(texts)
+        if self.keyed_tokens is not None:
+            mappings = self.vault.lookup(tokens) if self.vault is not None else {}
+        else:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                mappings = self.session_mappings(cursor, session_id, tokens)
+            except Exception as e:
+                logger.error("Błąd podczas deanonimizacji: %s", e)
+                raise
+            finally:
+                cursor.close()
+                release_db_connection(conn)
+        # Jedno przejście po każdym tekście – tokeny bez mapowania pozostają bez zmian
+        return [TOKEN_REGEX.sub(lambda m: mappings.get(m.group(), m.group()), text) for text in texts]
+
+    @staticmethod
+    def session_mappings(cursor, session_id: str, tokens: set) -> dict:
+        """{token: oryginalna wartość} z mapowań sesji – jedno zapytanie od partycji otwarcia sesji."""
+        cursor.execute(
+            "SELECT anon_id, original_value FROM anonymization "
+            "WHERE session_id = %s AND anon_id = ANY(%s) AND created_at >= COALESCE("
+            "(SELECT opened_at FROM sessions WHERE session_id = %s), '-infinity')",
+            (session_id, list(tokens), session_id)
+        )
+        return dict(cursor.fetchall())
 
 # Przykładowe użycie (do testów lokalnych)
 if __name__ == "__main__":
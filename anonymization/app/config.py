@@ -0,0 +1,78 @@
+import os
+
+# Konfiguracja bazy danych i puli połączeń
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://anon_user:securepassword@db/anon_db")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # maks. czas oczekiwania na połączenie (s)
+DB_POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", "1000"))  # wymiana połączenia po N wypożyczeniach
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # kontrola po N s bezczynności
+
+# Retencja mapowań: partycje dzienne starsze niż N dni są usuwane w całości (0 = bez retencji)
+MAPPING_RETENTION_DAYS = int(os.getenv("MAPPING_RETENTION_DAYS", "0"))
+MAPPING_PARTITIONS_AHEAD = int(os.getenv("MAPPING_PARTITIONS_AHEAD", "3"))  # partycje tworzone z wyprzedzeniem (dni)
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))  # co ile sekund
+
+# Dodatkowy słownik imion i nazwisk (plik tekstowy, jedna fraza na linię)
+NAME_GAZETTEER_PATH = os.getenv("NAME_GAZETTEER_PATH", "")
+
+# Detektory uruchamiane wewnątrz analizatora Presidio (np. "STREET,PERSON");
+# pozostałe działają w szybkiej ścieżce natywnej. Każdy detektor uruchamiany jest dokładnie raz.
+PRESIDIO_HOSTED_DETECTORS = {
+    entity.strip().upper() for entity in os.getenv("PRESIDIO_HOSTED_DETECTORS", "").split(",") if entity.strip()
+}
+
+# Priorytet typów encji przy rozwiązywaniu nakładających się fragmentów o tej samej długości
+# i tym samym wyniku (wcześniej na liście = wyższy priorytet)
+ENTITY_PRIORITY = [
+    entity.strip().upper()
+    for entity in os.getenv(
+        "ENTITY_PRIORITY",
+        "CREDIT_CARD,TAX_ID,PHONE_NUMBER,DATE,STREET,LICENSE_PLATE,PERSON,LOCATION,ZIP_CODE"
+    ).split(",")
+    if entity.strip()
+]
+
+# Przetwarzanie wsadowe: maks. liczba tekstów w jednym żądaniu /anonymize/batch
+# i rozmiar partii przekazywanej do modelu spaCy (nlp.pipe)
+BATCH_MAX_TEXTS = int(os.getenv("BATCH_MAX_TEXTS", "1000"))
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))
+
+# Liczba sesji, których moment otwarcia i tokeny przechowywane są w pamięci procesu (bez zapytania do bazy)
+# oraz maks. liczba tokenów zapamiętywanych na sesję
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_MAX_TOKENS = int(os.getenv("SESSION_CACHE_MAX_TOKENS", "10000"))
+
+# Triage: tanie cechy tekstu (długość, cyfry, wielkie litery, nazwy miesięcy) decydują, które detektory
+# i czy analizator NLP są uruchamiane; liczniki pominięć pod /admin/triage
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Pamięć podręczna wyników detekcji (skrót znormalizowanego tekstu -> fragmenty) – limit szacowanej
+# zajętości pamięci w bajtach; 0 wyłącza
+SPAN_CACHE_MAX_BYTES = int(os.getenv("SPAN_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Format tokenów: prefiks i liczba znaków (base36) po prefiksie, np. anno_g0000001. TOKEN_REGEX usługi
+# i TOKEN_PREFIX bramki (api) muszą odpowiadać tym ustawieniom; zmiana długości sprawia, że tokeny
+# o poprzedniej długości nie są już rozpoznawane przy deanonimizacji.
+TOKEN_PREFIX = os.getenv("TOKEN_PREFIX", "anno_")
+TOKEN_LENGTH = int(os.getenv("TOKEN_LENGTH", "8"))
+
+# Tryb tokenów: "sequence" (token z sekwencji bazy, zapisywany w mapowaniach sesji) albo "hmac" (token wyliczany
+# z HMAC(klucz, tenant, typ encji, wartość) – bez zapisu do bazy, ten sam dla wartości we wszystkich żądaniach)
+TOKEN_MODES = ("sequence", "hmac")
+TOKEN_MODE = os.getenv("TOKEN_MODE", "sequence").strip().lower()
+if TOKEN_MODE not in TOKEN_MODES:
+    # Nieznany tryb (także dawne "random") zatrzymuje start zamiast cichej zmiany trybu tokenów
+    raise ValueError(f"Unknown TOKEN_MODE {TOKEN_MODE!r}: use 'sequence' (formerly 'random') or 'hmac'")
+# Liczba identyfikatorów tokenów rezerwowanych przez proces jednym zapytaniem do sekwencji
+TOKEN_BLOCK_SIZE = int(os.getenv("TOKEN_BLOCK_SIZE", "1000"))
+TOKEN_HMAC_KEY = os.getenv("TOKEN_HMAC_KEY", "")
+# Długość tokenów hmac (znaki hex po TOKEN_PREFIX); co najmniej 16 (64 bity) – token jest wspólny dla całego tenanta
+TOKEN_HMAC_LENGTH = int(os.getenv("TOKEN_HMAC_LENGTH", "16"))
+TOKEN_TENANT = os.getenv("TOKEN_TENANT", "default")
+
+# Sejf tokenów deterministycznych (tabela token_vault, zapis odroczony) – umożliwia deanonimizację w trybie hmac
+TOKEN_VAULT_ENABLED = os.getenv("TOKEN_VAULT_ENABLED", "false").lower() in ("1", "true", "yes")
+TOKEN_VAULT_FLUSH_INTERVAL = float(os.getenv("TOKEN_VAULT_FLUSH_INTERVAL", "1"))  # co ile sekund
+TOKEN_VAULT_BATCH_SIZE = int(os.getenv("TOKEN_VAULT_BATCH_SIZE", "1000"))  # wierszy na INSERT
+TOKEN_VAULT_MAX_PENDING = int(os.getenv("TOKEN_VAULT_MAX_PENDING", "100000"))  # zapis natychmiastowy po przekroczeniu
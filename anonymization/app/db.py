@@ -0,0 +1,223 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+# Katalog z migracjami schematu (pliki NNN_opis.sql stosowane w kolejności nazw)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Identyfikator blokady doradczej – równolegle startujące instancje nie wykonują migracji jednocześnie
+MIGRATION_LOCK_ID = 0x616E6F6E
+
+
+class PoolTimeout(Exception):
+    """Brak wolnego połączenia w puli w zadanym czasie."""
+
+
+class ConnectionPool:
+    """
+    Pula połączeń z bazą danych bezpieczna wątkowo.
+
+    - min_size połączeń otwieranych przy starcie, maksymalnie max_size jednocześnie,
+    - pobranie połączenia czeka najwyżej `timeout` sekund (PoolTimeout),
+    - połączenie bezczynne dłużej niż `health_check_interval` jest sprawdzane (SELECT 1) przed wydaniem,
+    - połączenie jest zamykane i zastępowane nowym po `max_uses` wypożyczeniach.
+    """
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, timeout: float = 5.0,
+                 max_uses: int = 1000, health_check_interval: float = 30.0):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        self._idle = deque()  # krotki (połączenie, czas zwrotu)
+        self._uses = {}       # id(połączenia) -> liczba wypożyczeń
+        self._in_use = set()  # id wypożyczonych połączeń
+        self._size = 0        # połączenia otwarte lub w trakcie otwierania
+        self._stats = {"created": 0, "closed": 0, "recycled": 0, "failed_health_checks": 0,
+                       "checkouts": 0, "timeouts": 0, "waiting": 0}
+
+    def open(self) -> None:
+        """Otwiera min_size połączeń (wywoływane przy starcie usługi)."""
+        while True:
+            # Miejsce rezerwowane po jednym – błąd połączenia zwalnia tylko miejsce bieżącej próby
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._uses[id(conn)] = 0
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        """Zamyka połączenie i zwalnia jego miejsce w puli (wywoływane z założoną blokadą)."""
+        self._uses.pop(id(conn), None)
+        self._size -= 1
+        self._stats["closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._cond.notify()
+
+    def getconn(self):
+        """Pobiera połączenie z puli, czekając najwyżej `timeout` sekund."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"Brak wolnego połączenia w puli po {self.timeout} s")
+                    self._stats["waiting"] += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._stats["waiting"] -= 1
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                else:
+                    conn, released_at = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, released_at):
+                with self._cond:
+                    self._stats["failed_health_checks"] += 1
+                    self._discard(conn)
+                continue
+
+            with self._cond:
+                self._in_use.add(id(conn))
+                self._stats["checkouts"] += 1
+            return conn
+
+    def _is_healthy(self, conn, released_at: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning("Połączenie z puli nie przeszło kontroli: %s", e)
+            return False
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Zwraca połączenie do puli; połączenia spoza puli są po prostu zamykane."""
+        with self._cond:
+            owned = id(conn) in self._in_use
+            self._in_use.discard(id(conn))
+        if not owned:
+            conn.close()
+            return
+
+        if not discard and not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._uses[id(conn)] = self._uses.get(id(conn), 0) + 1
+            if discard or conn.closed:
+                self._discard(conn)
+            elif self.max_uses and self._uses[id(conn)] >= self.max_uses:
+                self._stats["recycled"] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Zamyka wszystkie bezczynne połączenia (wywoływane przy zamykaniu usługi)."""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                **self._stats,
+            }
+
+
+def run_migrations(conn, directory: str = MIGRATIONS_DIR) -> list:
+    """
+    Stosuje brakujące migracje schematu (idempotentnie) i zwraca listę zastosowanych wersji.
+    Każda migracja wykonywana jest w osobnej transakcji razem z wpisem do schema_migrations.
+    """
+    applied_now = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    conn.commit()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+
+        for filename in sorted(os.listdir(directory)):
+            version, extension = os.path.splitext(filename)
+            if extension != ".sql" or version in applied:
+                continue
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                    cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.error("Błąd migracji %s", version)
+                raise
+            logger.info("Zastosowano migrację %s", version)
+            applied_now.append(version)
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+    return applied_now
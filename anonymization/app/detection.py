@@ -0,0 +1,191 @@
+import re
+import logging
+import threading
+from presidio_analyzer import BatchAnalyzerEngine, Pattern, PatternRecognizer, RecognizerResult
+
+logger = logging.getLogger(__name__)
+
+_DIGIT = re.compile(r"\d")
+_LETTER = re.compile(r"[^\W\d_]")
+_NLP_SYMBOL = re.compile(r"[@.:/]")  # e-mail, URL, adres IP
+_SEPARATOR = re.compile(r"[-./]")  # separatory dat liczbowych
+_MONTH = re.compile(r"jan|feb|mär|apr|mai|jun|jul|aug|sep|okt|nov|dez", re.IGNORECASE)
+
+# Teksty krótsze niż NLP_MIN_LENGTH nie trafiają do analizatora NLP; bez wielkich liter i symboli
+# analizator uruchamiany jest dopiero od NLP_MIN_DIGITS cyfr (numery telefonów, daty)
+NLP_MIN_LENGTH = 3
+NLP_MIN_DIGITS = 6
+
+
+class TextFeatures:
+    """Tanie cechy tekstu liczone raz przed detekcją (triage) – na ich podstawie pomijane są detektory."""
+
+    __slots__ = ("length", "digits", "has_upper", "has_letter", "has_symbol", "has_separator", "has_month")
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.digits = len(_DIGIT.findall(text))
+        self.has_upper = text != text.lower()
+        self.has_letter = _LETTER.search(text) is not None
+        self.has_symbol = _NLP_SYMBOL.search(text) is not None
+        self.has_separator = _SEPARATOR.search(text) is not None
+        self.has_month = self.has_letter and _MONTH.search(text) is not None
+
+    def may_contain_nlp_entity(self) -> bool:
+        """Czy analizator NLP (spaCy i recognizery Presidio) może cokolwiek znaleźć w tekście."""
+        if self.length < NLP_MIN_LENGTH:
+            return False
+        return self.has_upper or self.has_symbol or self.digits >= NLP_MIN_DIGITS
+
+
+class TriageCounters:
+    """Liczniki uruchomień i pominięć detektorów (oraz analizatora NLP) przez triage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}
+        self._skipped = {}
+
+    def record(self, ran=(), skipped=()) -> None:
+        with self._lock:
+            for name in ran:
+                self._runs[name] = self._runs.get(name, 0) + 1
+            for name in skipped:
+                self._skipped[name] = self._skipped.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            names = sorted(set(self._runs) | set(self._skipped))
+            return {
+                name: {"runs": self._runs.get(name, 0), "skipped": self._skipped.get(name, 0)}
+                for name in names
+            }
+
+
+class PatternDetector:
+    """Detektor oparty na wyrażeniu regularnym kompilowanym raz przy starcie."""
+
+    def __init__(self, entity_type: str, regex: str, score: float, flags: int = re.IGNORECASE, triage=None):
+        self.entity_type = entity_type
+        self.regex = regex
+        self.score = score
+        self.compiled = re.compile(regex, flags)
+        # triage(cechy) -> False, gdy wzorzec na pewno nie pasuje (warunek konieczny, np. liczba cyfr)
+        self.triage = triage
+
+    def may_match(self, features: TextFeatures) -> bool:
+        return self.triage is None or self.triage(features)
+
+    def detect(self, text: str) -> list:
+        results = []
+        for match in self.compiled.finditer(text):
+            logger.debug("Wykryto %s: %s", self.entity_type, match.group())
+            results.append(RecognizerResult(start=match.start(), end=match.end(), entity_type=self.entity_type, score=self.score))
+        return results
+
+    def to_recognizer(self, language: str) -> PatternRecognizer:
+        """Ten sam detektor w postaci recognizera Presidio."""
+        pattern = Pattern(name=self.entity_type, regex=self.regex, score=self.score)
+        return PatternRecognizer(supported_entity=self.entity_type, patterns=[pattern], supported_language=language)
+
+
+class DetectionEngine:
+    """
+    Skompilowany silnik detekcji – wzorce są kompilowane raz (przy starcie),
+    a każdy tekst jest skanowany kolejno wszystkimi detektorami bez ponownej kompilacji.
+    """
+
+    def __init__(self, detectors: list, counters: TriageCounters = None):
+        # Kolejność detektorów = kolejność wyników
+        self.detectors = list(detectors)
+        self._by_entity = {detector.entity_type: detector for detector in self.detectors}
+        self.counters = counters
+
+    @property
+    def entities(self) -> list:
+        return [detector.entity_type for detector in self.detectors]
+
+    def detect_entity(self, entity_type: str, text: str) -> list:
+        """Zwraca dopasowania jednego typu encji."""
+        return self._by_entity[entity_type].detect(text)
+
+    def detect(self, text: str, entities=None, features: TextFeatures = None) -> list:
+        """
+        Zwraca dopasowania wszystkich (lub wybranych) typów encji w kolejności rejestracji.
+        Z cechami tekstu (triage) pomijane są detektory, które nie mogą niczego dopasować.
+        """
+        results = []
+        ran, skipped = [], []
+        for detector in self.detectors:
+            if entities is not None and detector.entity_type not in entities:
+                continue
+            if features is not None and not detector.may_match(features):
+                skipped.append(detector.entity_type)
+                continue
+            ran.append(detector.entity_type)
+            results += detector.detect(text)
+        if features is not None and self.counters is not None:
+            self.counters.record(ran, skipped)
+        return results
+
+
+class DetectionPipeline:
+    """
+    Jednolity potok detekcji – każdy detektor uruchamiany jest dokładnie raz:
+    albo w szybkiej ścieżce natywnej, albo jako recognizer w analizatorze Presidio.
+    """
+
+    NLP = "NLP"  # nazwa analizatora NLP w licznikach triage
+
+    def __init__(self, analyzer, detectors: list, presidio_hosted=(), language: str = "de",
+                 triage: bool = True, counters: TriageCounters = None):
+        self.analyzer = analyzer
+        self.batch_analyzer = BatchAnalyzerEngine(analyzer)
+        self.language = language
+        self.triage = triage
+        self.counters = counters if counters is not None else TriageCounters()
+        self.native = DetectionEngine([d for d in detectors if d.entity_type not in presidio_hosted], self.counters)
+        self.hosted = [d for d in detectors if d.entity_type in presidio_hosted]
+        for detector in self.hosted:
+            # Język musi odpowiadać językowi analizy, inaczej Presidio pomija recognizer
+            self.analyzer.registry.add_recognizer(detector.to_recognizer(language))
+        logger.info(
+            "Detektory natywne: %s; detektory w Presidio: %s",
+            self.native.entities, [d.entity_type for d in self.hosted]
+        )
+
+    def features(self, text: str):
+        return TextFeatures(text) if self.triage else None
+
+    def needs_nlp(self, features) -> bool:
+        """Czy tekst trafia do analizatora NLP (bez triage – zawsze)."""
+        if features is None:
+            return True
+        needed = features.may_contain_nlp_entity() or any(d.may_match(features) for d in self.hosted)
+        self.counters.record([self.NLP] if needed else (), () if needed else [self.NLP])
+        return needed
+
+    def analyze(self, text: str) -> list:
+        """Zwraca wyniki detektorów natywnych oraz analizatora NLP (z detektorami hostowanymi w Presidio)."""
+        features = self.features(text)
+        results = self.native.detect(text, features=features)
+        if self.needs_nlp(features):
+            results += self.analyzer.analyze(text=text, language=self.language)
+        return results
+
+    def analyze_batch(self, texts: list, batch_size: int = 32) -> list:
+        """
+        Jak analyze(), ale dla listy tekstów: model spaCy przetwarza teksty partiami (nlp.pipe),
+        detektory natywne działają osobno dla każdego tekstu. Wyniki w kolejności tekstów.
+        """
+        features = [self.features(text) for text in texts]
+        nlp_indexes = [index for index, text_features in enumerate(features) if self.needs_nlp(text_features)]
+        nlp_results = {}
+        if nlp_indexes:
+            nlp_results = dict(zip(nlp_indexes, self.batch_analyzer.analyze_iterator(
+                [texts[index] for index in nlp_indexes], language=self.language, batch_size=batch_size
+            )))
+        return [
+            self.native.detect(text, features=text_features) + list(nlp_results.get(index, []))
+            for index, (text, text_features) in enumerate(zip(texts, features))
+        ]
@@ -0,0 +1,113 @@
+import re
+import logging
+from typing import Iterable, List, Optional
+from presidio_analyzer import EntityRecognizer, RecognizerResult
+
+logger = logging.getLogger(__name__)
+
+# Początki słów – tylko od nich może zaczynać się dopasowanie (odpowiednik \b w regexie)
+_WORD_START = re.compile(r"\b\w")
+
+
+def _is_word_char(ch: str) -> bool:
+    """Odpowiednik klasy \\w dla wyrażeń regularnych na typie str."""
+    return ch.isalnum() or ch == "_"
+
+
+def load_gazetteer_file(path: Optional[str]) -> List[str]:
+    """Wczytuje słownik z pliku (jedna fraza na linię, '#' rozpoczyna komentarz)."""
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        entries = [line.strip() for line in f]
+    entries = [entry for entry in entries if entry and not entry.startswith("#")]
+    logger.info("Wczytano %d wpisów słownika z %s", len(entries), path)
+    return entries
+
+
+class Gazetteer:
+    """
+    Słownik fraz w postaci drzewa trie budowanego raz przy starcie.
+
+    Dopasowanie musi zaczynać się i kończyć na granicy słowa, dlatego automat
+    startuje wyłącznie z początków słów i schodzi po trie znak po znaku.
+    Koszt skanowania zależy od długości tekstu i najdłuższej frazy,
+    a nie od liczby wpisów w słowniku.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        # Węzeł trie: słownik znak -> węzeł; klucz None oznacza koniec frazy
+        self._root = {}
+        self.size = 0
+        self.capitalized = True  # czy każda fraza zaczyna się wielką literą (triage: tekst bez wielkich liter)
+        for phrase in phrases:
+            self.add(phrase)
+
+    def add(self, phrase: str) -> None:
+        if not phrase:
+            return
+        node = self._root
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        if None not in node:
+            node[None] = True
+            self.size += 1
+            self.capitalized = self.capitalized and phrase[0].isupper()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def finditer(self, text: str):
+        """Zwraca krotki (start, end) wszystkich dopasowań z zachowaniem granic słów."""
+        root = self._root
+        length = len(text)
+        for word in _WORD_START.finditer(text):
+            start = word.start()
+            node = root
+            pos = start
+            while pos < length:
+                node = node.get(text[pos])
+                if node is None:
+                    break
+                pos += 1
+                if None in node and _is_word_char(text[pos - 1]) != (pos < length and _is_word_char(text[pos])):
+                    yield start, pos
+
+    def detect(self, text: str, entity_type: str, score: float) -> list:
+        return [
+            RecognizerResult(entity_type=entity_type, start=start, end=end, score=score)
+            for start, end in self.finditer(text)
+        ]
+
+
+class GazetteerRecognizer(EntityRecognizer):
+    """Detektor Presidio oparty na słowniku (zamiast jednego regexu z alternatywą wszystkich fraz)."""
+
+    def __init__(self, supported_entity: str, gazetteer: Gazetteer, score: float, **kwargs):
+        self.gazetteer = gazetteer
+        self.score = score
+        super().__init__(supported_entities=[supported_entity], **kwargs)
+
+    def load(self) -> None:
+        pass
+
+    def analyze(self, text: str, entities: List[str], nlp_artifacts=None) -> List[RecognizerResult]:
+        return self.gazetteer.detect(text, self.supported_entities[0], self.score)
+
+
+class GazetteerDetector:
+    """Detektor słownikowy o tym samym interfejsie co PatternDetector."""
+
+    def __init__(self, entity_type: str, gazetteer: Gazetteer, score: float):
+        self.entity_type = entity_type
+        self.gazetteer = gazetteer
+        self.score = score
+
+    def may_match(self, features) -> bool:
+        return features.has_upper if self.gazetteer.capitalized else features.has_letter
+
+    def detect(self, text: str) -> list:
+        return self.gazetteer.detect(text, self.entity_type, self.score)
+
+    def to_recognizer(self, language: str) -> GazetteerRecognizer:
+        return GazetteerRecognizer(self.entity_type, self.gazetteer, self.score, supported_language=language)
@@ -1,9 +1,45 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, HTTPException
-from app.anonymizer import AnonymizationService
+from app.anonymizer import (
+    AnonymizationService, db_pool, invalidate_span_cache, span_cache, token_vault, triage_counters
+)
+from app.config import BATCH_MAX_TEXTS, MAPPING_PARTITIONS_AHEAD, MAPPING_RETENTION_DAYS, PARTITION_MAINTENANCE_INTERVAL
+from app.db import run_migrations
+from app.partitions import PartitionMaintenance, list_partitions
+from app.sessions import parse_session_id
 
 import uuid
 
-app = FastAPI()
+partition_maintenance = PartitionMaintenance(
+    db_pool,
+    retention_days=MAPPING_RETENTION_DAYS,
+    days_ahead=MAPPING_PARTITIONS_AHEAD,
+    interval=PARTITION_MAINTENANCE_INTERVAL,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migracje schematu przy starcie; gdy baza jest niedostępna, usługa nie startuje (restart kontenera ponowi próbę)
+    db_pool.open()
+    conn = db_pool.getconn()
+    try:
+        run_migrations(conn)
+    finally:
+        db_pool.putconn(conn)
+    # Partycje na najbliższe dni muszą istnieć przed pierwszym zapisem
+    partition_maintenance.run_once()
+    partition_maintenance.start()
+    if token_vault is not None:
+        token_vault.start()
+    yield
+    if token_vault is not None:
+        # Zapis odroczony: pozostałe mapowania sejfu trafiają do bazy przed zamknięciem puli
+        token_vault.stop()
+    partition_maintenance.stop()
+    db_pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def home():
@@ -11,25 +47,124 @@ def home():
 
 service = AnonymizationService()
 
+def session_id_from(data: dict, required: bool = False) -> str:
+    """session_id z żądania (walidowany jako UUID); bez session_id – nowy identyfikator sesji."""
+    session_id = data.get("session_id")
+    if not session_id:
+        if required:
+            raise HTTPException(status_code=400, detail="session_id is required")
+        return str(uuid.uuid4())
+    try:
+        return parse_session_id(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/sessions")
+def open_session(data: Optional[dict] = None):
+    """Otwiera sesję (opcjonalnie o identyfikatorze podanym przez klienta); kolejne żądania podają jej session_id."""
+    session_id = session_id_from(data or {})
+    return service.open_session(session_id)
+
 @app.post("/anonymize")
 def anonymize(data: dict):
     text = data.get("text", "")
     if not text:
         raise HTTPException(status_code=400, detail="Text is required")
 
-    session_id = str(uuid.uuid4())  # Generowanie unikalnego session_id
+    session_id = session_id_from(data)  # session_id klienta lub nowa sesja
     anonymized_text = service.anonymize_text(session_id, text)  # ✅ Teraz używa klasy!
 
     return {"session_id": session_id, "anonymized_text": anonymized_text}
 
+@app.post("/anonymize/batch")
+def anonymize_batch(data: dict):
+    """Anonimizuje listę tekstów w jednej sesji; wyniki w tej samej kolejności co teksty."""
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        raise HTTPException(status_code=400, detail="texts must be a non-empty list of strings")
+    if len(texts) > BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TEXTS} texts per batch")
+
+    session_id = session_id_from(data)
+    anonymized_texts = service.anonymize_batch(session_id, texts)
+
+    return {"session_id": session_id, "anonymized_texts": anonymized_texts}
+
+@app.post("/anonymize/entities")
+def anonymize_entities(data: dict):
+    """Zastępuje tokenami wartości o podanym typie encji (bez detekcji); wyniki w kolejności wartości."""
+    entities = data.get("entities")
+    if not isinstance(entities, list) or not entities or not all(
+        isinstance(entity, dict) and isinstance(entity.get("text"), str) and entity["text"]
+        and isinstance(entity.get("entity_type"), str) and entity["entity_type"]
+        for entity in entities
+    ):
+        raise HTTPException(status_code=400, detail="entities must be a non-empty list of {text, entity_type}")
+    if len(entities) > BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TEXTS} entities per batch")
+
+    session_id = session_id_from(data)
+    anonymized_texts = service.anonymize_entities(
+        session_id, [(entity["text"], entity["entity_type"]) for entity in entities]
+    )
+
+    return {"session_id": session_id, "anonymized_texts": anonymized_texts}
+
 @app.post("/deanonymize")
 def deanonymize(data: dict):
-    session_id = data.get("session_id", "")
     text = data.get("text", "")
-
-    if not session_id or not text:
+    if not data.get("session_id") or not text:
         raise HTTPException(status_code=400, detail="session_id and text are required")
+    session_id = session_id_from(data, required=True)
 
     deanonymized_text = service.deanonymize_text(session_id, text)  # ✅ Używa klasy!
 
     return {"deanonymized_text": deanonymized_text}
+
+@app.post("/deanonymize/batch")
+def deanonymize_batch(data: dict):
+    """Deanonimizuje listę tekstów jednej sesji jednym odczytem mapowań; wyniki w kolejności tekstów."""
+    session_id = session_id_from(data, required=True)
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        raise HTTPException(status_code=400, detail="texts must be a non-empty list of strings")
+
+    deanonymized_texts = service.deanonymize_batch(session_id, texts)
+
+    return {"deanonymized_texts": deanonymized_texts}
+
+@app.get("/admin/db-pool")
+def db_pool_stats():
+    """Statystyki puli połączeń z bazą danych (do strojenia pod obciążeniem)."""
+    return db_pool.stats()
+
+@app.get("/admin/triage")
+def triage_stats():
+    """Ile razy każdy detektor, analizator NLP i normalizacja zostały uruchomione, a ile pominięte przez triage."""
+    return triage_counters.stats()
+
+@app.get("/admin/span-cache")
+def span_cache_stats():
+    """Statystyki pamięci podręcznej wyników detekcji: trafienia, chybienia, usunięcia i zajętość."""
+    return span_cache.stats()
+
+@app.post("/admin/span-cache/invalidate")
+def span_cache_invalidate():
+    """Czyści pamięć podręczną wyników detekcji (np. po zmianie recognizerów lub słownika imion)."""
+    return invalidate_span_cache()
+
+@app.get("/admin/token-vault")
+def token_vault_stats():
+    """Stan sejfu tokenów trybu hmac: oczekujące i zapisane mapowania, kolizje, błędy zapisu."""
+    if token_vault is None:
+        raise HTTPException(status_code=404, detail="Token vault is disabled")
+    return token_vault.stats()
+
+@app.get("/admin/partitions")
+def partitions():
+    """Partycje tabeli mapowań: zakres dat, rozmiar na dysku i szacowana liczba wierszy."""
+    conn = db_pool.getconn()
+    try:
+        return {"retention_days": MAPPING_RETENTION_DAYS, "partitions": list_partitions(conn)}
+    finally:
+        db_pool.putconn(conn)
@@ -0,0 +1,22 @@
+-- Tabela mapowań token -> oryginalna wartość używana przez AnonymizationService
+CREATE TABLE IF NOT EXISTS anonymization (
+    session_id UUID NOT NULL,
+    anon_id TEXT NOT NULL,
+    original_value TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (session_id, anon_id)
+);
+
+-- Tabele utworzone wcześniej ręcznie: uzupełnienie brakującej kolumny i klucza głównego
+ALTER TABLE anonymization ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'anonymization'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE anonymization ADD PRIMARY KEY (session_id, anon_id);
+    END IF;
+END $$;
@@ -0,0 +1,57 @@
+-- Partycjonowanie tabeli mapowań po created_at: dzienne partycje tworzy i usuwa usługa
+-- (app/partitions.py), dzięki czemu retencja usuwa całe partycje zamiast pojedynczych wierszy.
+ALTER TABLE anonymization RENAME TO anonymization_legacy;
+
+CREATE TABLE anonymization (
+    session_id UUID NOT NULL,
+    anon_id TEXT NOT NULL,
+    original_value TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (session_id, anon_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Dotychczasowe wiersze tworzą jedną partycję obejmującą wszystko do końca bieżącego dnia (UTC);
+-- jej klucz (o dowolnej nazwie – tabele tworzone ręcznie) zastępuje indeks zgodny z kluczem tabeli partycjonowanej
+DO $$
+DECLARE
+    pkey TEXT;
+BEGIN
+    SELECT conname INTO pkey FROM pg_constraint
+    WHERE conrelid = 'anonymization_legacy'::regclass AND contype = 'p';
+    IF pkey IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE anonymization_legacy DROP CONSTRAINT %I', pkey);
+    END IF;
+END $$;
+
+-- Partycja musi mieć typy kolumn tabeli partycjonowanej (tabele ręczne: np. TEXT zamiast UUID,
+-- TIMESTAMP zamiast TIMESTAMPTZ); zmieniane są tylko kolumny o innym typie
+DO $$
+DECLARE
+    target RECORD;
+BEGIN
+    FOR target IN
+        SELECT a.attname, t.type_name
+        FROM (VALUES ('session_id', 'uuid'), ('anon_id', 'text'), ('original_value', 'text'),
+                     ('entity_type', 'text'), ('created_at', 'timestamp with time zone')) AS t(column_name, type_name)
+        JOIN pg_attribute a ON a.attrelid = 'anonymization_legacy'::regclass AND a.attname = t.column_name
+        WHERE format_type(a.atttypid, a.atttypmod) <> t.type_name
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE anonymization_legacy ALTER COLUMN %I TYPE %s USING %I::%s',
+            target.attname, target.type_name, target.attname, target.type_name
+        );
+    END LOOP;
+END $$;
+ALTER TABLE anonymization_legacy
+    ALTER COLUMN session_id SET NOT NULL,
+    ALTER COLUMN anon_id SET NOT NULL,
+    ALTER COLUMN original_value SET NOT NULL,
+    ALTER COLUMN entity_type SET NOT NULL;
+CREATE UNIQUE INDEX anonymization_legacy_session_anon_created_idx
+    ON anonymization_legacy (session_id, anon_id, created_at);
+ALTER TABLE anonymization ATTACH PARTITION anonymization_legacy
+    FOR VALUES FROM (MINVALUE) TO (date_trunc('day', now(), 'UTC') + interval '1 day');
+
+-- Zabezpieczenie na wypadek braku partycji dziennej (powinna pozostać pusta)
+CREATE TABLE anonymization_default PARTITION OF anonymization DEFAULT;
@@ -0,0 +1,14 @@
+-- Sesje anonimizacji: identyfikator nadany przez klienta lub usługę oraz moment otwarcia.
+-- Wiersze mapowań sesji zapisywane są z created_at = opened_at, więc cała sesja trafia
+-- do jednej partycji dziennej, a odczyt sesji pomija partycje starsze niż jej otwarcie.
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id UUID PRIMARY KEY,
+    opened_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS sessions_opened_at_idx ON sessions (opened_at);
+
+-- Sesje sprzed tej migracji: moment otwarcia = najstarszy zapisany wiersz sesji
+INSERT INTO sessions (session_id, opened_at)
+SELECT session_id, min(created_at) FROM anonymization GROUP BY session_id
+ON CONFLICT (session_id) DO NOTHING;
@@ -0,0 +1,26 @@
+-- Jedna wartość danego typu = jeden token w sesji. Wiersze sesji mają wspólne created_at
+-- (moment otwarcia sesji), więc indeks z kluczem partycjonowania jest unikalny w obrębie sesji
+-- i służy jako arbiter zapisu INSERT ... ON CONFLICT.
+
+-- Starsze wiersze mogą powtarzać (sesja, wartość, typ, created_at) – np. po uzupełnieniu kolumny
+-- created_at jedną wartością. Duplikaty zachowują swoje tokeny, a created_at przesuwane jest
+-- o pojedyncze mikrosekundy wstecz (w granicach partycji legacy).
+UPDATE anonymization_legacy AS l
+SET created_at = l.created_at - d.shift * interval '1 microsecond'
+FROM (
+    SELECT ctid,
+           row_number() OVER (
+               PARTITION BY session_id, original_value, entity_type, created_at ORDER BY anon_id
+           ) - 1 AS shift
+    FROM anonymization_legacy
+) AS d
+WHERE l.ctid = d.ctid AND d.shift > 0;
+
+-- Moment otwarcia sesji nie może być późniejszy niż jej najstarszy wiersz (odczyt pomija starsze wiersze)
+UPDATE sessions AS s
+SET opened_at = m.first_created_at
+FROM (SELECT session_id, min(created_at) AS first_created_at FROM anonymization_legacy GROUP BY session_id) AS m
+WHERE s.session_id = m.session_id AND m.first_created_at < s.opened_at;
+
+CREATE UNIQUE INDEX IF NOT EXISTS anonymization_session_value_idx
+    ON anonymization (session_id, original_value, entity_type, created_at);
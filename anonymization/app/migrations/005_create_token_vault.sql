@@ -0,0 +1,11 @@
+-- Sejf tokenów deterministycznych (TOKEN_MODE=hmac): token -> oryginalna wartość w obrębie tenanta.
+-- Wypełniany z opóźnieniem (zapis odroczony) i tylko przy TOKEN_VAULT_ENABLED; bez niego tokeny
+-- deterministyczne są nieodwracalne.
+CREATE TABLE IF NOT EXISTS token_vault (
+    tenant TEXT NOT NULL,
+    anon_id TEXT NOT NULL,
+    original_value TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (tenant, anon_id)
+);
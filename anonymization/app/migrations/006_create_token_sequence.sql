@@ -0,0 +1,3 @@
+-- Sekwencja identyfikatorów tokenów: procesy rezerwują z niej bloki identyfikatorów,
+-- więc każdy token jest unikalny bez sprawdzania w tabeli mapowań.
+CREATE SEQUENCE IF NOT EXISTS anon_token_seq AS BIGINT;
@@ -0,0 +1,87 @@
+import re
+from bisect import bisect_left, bisect_right
+
+# Normalizacja nazw ulic przed detekcją w jednym przejściu (jeden skompilowany wzorzec z alternatywami).
+# Detekcja działa na znormalizowanym widoku tekstu, a tokeny wstawiane są w tekst oryginalny –
+# mapa przesunięć przelicza fragmenty widoku na fragmenty oryginału.
+#
+# Przekształcenia widoku:
+# - "Haupt Str." / "Haupt-Str" → "Haupt Straße" (także Pl. → Platz, Al. → Allee),
+# - "Hauptstraße" → "Haupt straße" (przyrostki straße, weg, platz, allee, gasse, ring, damm, ufer),
+# - "Werner-von-Siemens-Straße" → "Werner von Siemens Straße",
+# - "Karl-Theodor-Heuss Straße 12" → "Karl Theodor Heuss Straße 12" (numer domu pozostaje w widoku).
+
+_LETTERS = "A-ZÄÖÜa-zäöüß"
+_SUFFIXES = "Straße|Weg|Platz|Allee|Ring|Gasse|Damm|Steig|Ufer|Hof|Chaussee"
+_COMPOUND_SUFFIXES = "straße|Straße|weg|platz|allee|gasse|ring|damm|ufer"
+
+ABBREVIATIONS = {"Str": "Straße", "Pl": "Platz", "Al": "Allee"}
+
+STREET_NORMALIZATION = re.compile(
+    # Nazwa z myślnikami zakończona przyrostkiem: Werner-von-Siemens-Straße
+    rf"\b(?P<hyphenated>[{_LETTERS}]+(?:-[{_LETTERS}]+)*-(?:{_SUFFIXES}))\b"
+    # Trzyczłonowa nazwa z myślnikami przed przyrostkiem i numerem: Karl-Theodor-Heuss Straße 12
+    rf"|\b(?P<spaced>[{_LETTERS}]+-[{_LETTERS}]+-[{_LETTERS}]+)(?=\s(?:{_SUFFIXES}|straße)\s\d)"
+    # Nazwa złożona: Hauptstraße (nie po myślniku: Werner-von-Siemens-straße pozostaje bez zmian)
+    rf"|\b(?P<prefix>[{_LETTERS}-]*[{_LETTERS}])(?:{_COMPOUND_SUFFIXES})\b"
+    # Skrót po słowie: Haupt Str. / Haupt-Str
+    rf"|(?<=[{_LETTERS}])[-\s]\b(?P<abbreviation>{'|'.join(ABBREVIATIONS)})(?:\.|\b)"
+)
+
+
+class NormalizedText:
+    """
+    Znormalizowany widok tekstu z mapą przesunięć do tekstu oryginalnego.
+    Zapamiętywane są tylko zmienione odcinki (norm_start, norm_end, orig_start, orig_end);
+    poza nimi przesunięcie jest stałe.
+    """
+
+    __slots__ = ("original", "text", "_segments", "_starts")
+
+    def __init__(self, original: str, text: str = None, segments: list = ()):
+        self.original = original
+        self.text = original if text is None else text
+        self._segments = list(segments)
+        self._starts = [segment[0] for segment in self._segments]
+
+    def original_span(self, start: int, end: int) -> tuple:
+        """Przelicza fragment widoku na fragment oryginału (fragment częściowo w zmienionym odcinku obejmuje cały odcinek)."""
+        index = bisect_right(self._starts, start) - 1
+        if index >= 0:
+            norm_start, norm_end, orig_start, orig_end = self._segments[index]
+            start = orig_start if start < norm_end else orig_end + (start - norm_end)
+        index = bisect_left(self._starts, end) - 1
+        if index >= 0:
+            norm_start, norm_end, orig_start, orig_end = self._segments[index]
+            end = orig_end + max(end - norm_end, 0)
+        return start, end
+
+
+def normalize_streets(text: str) -> NormalizedText:
+    """Zwraca znormalizowany widok tekstu (nazwy ulic) razem z mapą przesunięć do oryginału."""
+    parts = []
+    segments = []
+    position = 0  # pozycja w oryginale
+    shift = 0     # przesunięcie widoku względem oryginału
+    for match in STREET_NORMALIZATION.finditer(text):
+        start, end = match.span()
+        parts.append(text[position:start])
+        kind = match.lastgroup
+        if kind in ("hyphenated", "spaced"):
+            # Myślniki na spacje – ta sama długość, bez zmiany przesunięć
+            parts.append(match.group().replace("-", " "))
+        elif kind == "prefix":
+            split = match.end("prefix")
+            parts.append(text[start:split] + " " + text[split:end])
+            segments.append((split + shift, split + shift + 1, split, split))
+            shift += 1
+        else:
+            replacement = " " + ABBREVIATIONS[match.group("abbreviation")]
+            parts.append(replacement)
+            segments.append((start + shift, start + shift + len(replacement), start, end))
+            shift += len(replacement) - (end - start)
+        position = end
+    if not parts:
+        return NormalizedText(text)
+    parts.append(text[position:])
+    return NormalizedText(text, "".join(parts), segments)
@@ -0,0 +1,221 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "anonymization"
+DEFAULT_PARTITION = "anonymization_default"
+# Identyfikator blokady doradczej – konserwację wykonuje naraz tylko jedna instancja usługi
+MAINTENANCE_LOCK_ID = 0x616E6F70
+# Liczba wierszy sesji usuwanych w jednej transakcji przy wygasaniu partycji
+SESSION_PURGE_BATCH_SIZE = 10000
+
+
+def list_partitions(conn) -> list:
+    """Zwraca partycje tabeli mapowań z zakresem, rozmiarem na dysku i szacowaną liczbą wierszy."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname,
+                   (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \\(''([^'']+)''\\)'))[1]::timestamptz,
+                   (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''([^'']+)''\\)'))[1]::timestamptz,
+                   pg_total_relation_size(c.oid),
+                   c.reltuples::bigint
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY 3 NULLS LAST, 1
+            """,
+            (PARENT_TABLE,)
+        )
+        rows = cursor.fetchall()
+    conn.commit()
+    return [
+        {
+            "name": name,
+            "from": lower,
+            "to": upper,
+            "size_bytes": size,
+            "estimated_rows": rows_estimate if rows_estimate >= 0 else None,
+        }
+        for name, lower, upper, size, rows_estimate in rows
+    ]
+
+
+def ensure_partitions(conn, days_ahead: int, now: datetime = None) -> list:
+    """Tworzy brakujące partycje dzienne (UTC) od końca ostatniej partycji do dnia bieżącego + days_ahead."""
+    today = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    upper_bounds = [p["to"].astimezone(timezone.utc).date() for p in list_partitions(conn) if p["to"]]
+    day = max([today] + upper_bounds)
+    created = []
+    while day <= today + timedelta(days=days_ahead):
+        name = f"{PARENT_TABLE}_p{day:%Y%m%d}"
+        bounds = (f"{day} 00:00:00+00", f"{day + timedelta(days=1)} 00:00:00+00")
+        try:
+            with conn.cursor() as cursor:
+                if _default_has_rows(cursor, bounds):
+                    _create_from_default(cursor, name, bounds)
+                else:
+                    cursor.execute(
+                        sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+                            sql.Identifier(name), sql.Identifier(PARENT_TABLE)
+                        ),
+                        bounds
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        created.append(name)
+        day += timedelta(days=1)
+    if created:
+        logger.info("Utworzono partycje: %s", created)
+    return created
+
+
+def _default_has_rows(cursor, bounds: tuple) -> bool:
+    """Czy partycja domyślna zawiera wiersze z zakresu (np. zapisane przez instancję przed utworzeniem partycji dnia)."""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (DEFAULT_PARTITION,))
+    if not cursor.fetchone()[0]:
+        return False
+    cursor.execute(
+        sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE created_at >= %s AND created_at < %s)").format(
+            sql.Identifier(DEFAULT_PARTITION)
+        ),
+        bounds
+    )
+    return cursor.fetchone()[0]
+
+
+def _create_from_default(cursor, name: str, bounds: tuple) -> None:
+    """
+    Tworzy partycję dnia, gdy partycja domyślna ma już wiersze z jej zakresu (CREATE ... PARTITION OF
+    zakończyłby się błędem przy każdym przebiegu): odłącza partycję domyślną, tworzy partycję dnia,
+    przenosi do niej wiersze i ponownie dołącza partycję domyślną – w transakcji wywołującego,
+    więc zapisy do tabeli czekają na jej zakończenie.
+    """
+    logger.warning("Partycja domyślna zawiera wiersze z zakresu %s – przenoszenie do %s", bounds, name)
+    parent, default = sql.Identifier(PARENT_TABLE), sql.Identifier(DEFAULT_PARTITION)
+    columns = sql.SQL("session_id, anon_id, original_value, entity_type, created_at")
+    in_range = sql.SQL("created_at >= %s AND created_at < %s")
+    cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(parent, default))
+    cursor.execute(
+        sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(name), parent),
+        bounds
+    )
+    cursor.execute(
+        sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} WHERE {}").format(
+            sql.Identifier(name), columns, columns, default, in_range
+        ),
+        bounds
+    )
+    cursor.execute(sql.SQL("DELETE FROM {} WHERE {}").format(default, in_range), bounds)
+    cursor.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} DEFAULT").format(parent, default))
+
+
+def purge_expired_partitions(conn, retention_days: int, now: datetime = None) -> list:
+    """
+    Usuwa całe partycje, których zakres kończy się wcześniej niż `retention_days` dni temu,
+    oraz sesje otwarte przed końcem ostatniej usuniętej partycji.
+    DROP TABLE partycji nie zostawia martwych krotek, więc nie obciąża VACUUM.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    dropped = []
+    expired_before = None
+    for partition in list_partitions(conn):
+        if partition["name"] == DEFAULT_PARTITION or partition["to"] is None or partition["to"] > cutoff:
+            continue
+        try:
+            with conn.cursor() as cursor:
+                # Krótki limit blokady – zajęta tabela zostanie usunięta przy kolejnym przebiegu
+                cursor.execute("SET LOCAL lock_timeout = '5s'")
+                cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition["name"])))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.warning("Nie udało się usunąć partycji %s: %s", partition["name"], e)
+            continue
+        dropped.append(partition["name"])
+        expired_before = max(expired_before or partition["to"], partition["to"])
+    if expired_before is not None:
+        purge_expired_sessions(conn, expired_before)
+    if dropped:
+        logger.info("Usunięto partycje starsze niż %d dni: %s", retention_days, dropped)
+    return dropped
+
+
+def purge_expired_sessions(conn, expired_before: datetime, batch_size: int = SESSION_PURGE_BATCH_SIZE) -> int:
+    """
+    Usuwa sesje otwarte przed `expired_before` (wiersze mapowań sesji leżą w partycji dnia jej otwarcia,
+    więc sesje z usuniętych partycji wygasają razem z nimi) i zwraca liczbę usuniętych wierszy.
+
+    Tabela sessions nie jest partycjonowana: open() wymaga unikalnego session_id (ON CONFLICT),
+    a klucz unikalny tabeli partycjonowanej musi zawierać klucz partycjonowania. Sesja to jeden
+    krótki wiersz wobec wielu wierszy mapowań, a usuwanie odbywa się partiami (indeks opened_at,
+    osobne transakcje) – martwe krotki powstają stopniowo i autovacuum nadąża je sprzątać.
+    """
+    deleted = 0
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM sessions WHERE ctid = ANY(ARRAY("
+                "SELECT ctid FROM sessions WHERE opened_at < %s LIMIT %s))",
+                (expired_before, batch_size)
+            )
+            count = cursor.rowcount
+        conn.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+class PartitionMaintenance:
+    """Okresowa konserwacja partycji: tworzenie partycji z wyprzedzeniem i usuwanie wygasłych."""
+
+    def __init__(self, pool, retention_days: int, days_ahead: int, interval: float):
+        self.pool = pool
+        self.retention_days = retention_days
+        self.days_ahead = days_ahead
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> dict:
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (MAINTENANCE_LOCK_ID,))
+                locked = cursor.fetchone()[0]
+            conn.commit()
+            if not locked:
+                return {"created": [], "dropped": [], "skipped": True}
+            try:
+                created = ensure_partitions(conn, self.days_ahead)
+                dropped = purge_expired_partitions(conn, self.retention_days)
+            finally:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (MAINTENANCE_LOCK_ID,))
+                conn.commit()
+            return {"created": created, "dropped": dropped, "skipped": False}
+        finally:
+            self.pool.putconn(conn)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Błąd konserwacji partycji: %s", e)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="partition-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
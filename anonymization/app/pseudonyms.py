@@ -0,0 +1,169 @@
+import hmac
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Token deterministyczny obejmuje wszystkie wartości tenanta (nie jedną sesję), a kolizja łączy dwie
+# osoby w eksporcie – token niesie co najmniej 64 bity skrótu (16 znaków hex)
+HMAC_MIN_HEX_CHARS = 16
+
+
+class KeyedTokens:
+    """
+    Deterministyczne tokeny: HMAC-SHA256(klucz, tenant, typ encji, wartość), `length` znaków hex skrótu.
+    Ta sama wartość otrzymuje ten sam token we wszystkich żądaniach i instancjach usługi
+    bez zapisu do bazy; bez klucza tokenu nie da się odwrócić ani przewidzieć.
+    """
+
+    def __init__(self, key: bytes, tenant: str = "", prefix: str = "anno_", length: int = HMAC_MIN_HEX_CHARS):
+        if not key:
+            raise ValueError("TOKEN_HMAC_KEY is required when TOKEN_MODE=hmac")
+        if not HMAC_MIN_HEX_CHARS <= length <= 64:
+            raise ValueError(f"TOKEN_HMAC_LENGTH must be between {HMAC_MIN_HEX_CHARS} and 64 hex characters")
+        self._key = key
+        self.tenant = tenant
+        self.prefix = prefix
+        self.length = length
+
+    def token(self, value: str, entity_type: str) -> str:
+        message = "\0".join((self.tenant, entity_type, value)).encode("utf-8")
+        return self.prefix + hmac.new(self._key, message, hashlib.sha256).hexdigest()[:self.length]
+
+    def tokens(self, keys) -> dict:
+        """{(fragment, typ): token} dla podanych kluczy."""
+        return {(value, entity_type): self.token(value, entity_type) for value, entity_type in keys}
+
+
+class TokenVault:
+    """
+    Opcjonalny sejf tokenów deterministycznych (tabela token_vault) z zapisem odroczonym:
+    nowe mapowania trafiają do bufora w pamięci, a wątek w tle zapisuje je partiami.
+    Tokeny zapisane niedawno nie są zapisywane ponownie. Odczyt uwzględnia bufor,
+    więc token jest odwracalny od razu po anonimizacji w tym procesie.
+    """
+
+    def __init__(self, pool, tenant: str, interval: float = 1.0, batch_size: int = 1000,
+                 max_pending: int = 100000, remembered: int = 100000):
+        self.pool = pool
+        self.tenant = tenant
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.remembered = remembered
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}              # token -> (fragment, typ)
+        self._flushing = {}             # mapowania zapisywane w tej chwili (widoczne dla lookup)
+        self._written = OrderedDict()   # tokeny zapisane niedawno (LRU)
+        self._stats = {"written": 0, "flushes": 0, "collisions": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, tokens: dict) -> None:
+        """Dodaje mapowania {(fragment, typ): token} do zapisu; przy przepełnionym buforze zapisuje od razu."""
+        with self._lock:
+            for key, token in tokens.items():
+                if token not in self._written:
+                    self._pending[token] = key
+            overflow = len(self._pending) >= self.max_pending
+        if overflow:
+            self.flush()
+
+    def flush(self) -> int:
+        """Zapisuje oczekujące mapowania (INSERT partiami) i zwraca liczbę zapisanych wierszy."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            if not pending:
+                return 0
+            items = list(pending.items())
+            collision_count = 0
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    for offset in range(0, len(items), self.batch_size):
+                        batch = items[offset:offset + self.batch_size]
+                        # DO UPDATE (bez zmiany wartości) zwraca wartość już zapisaną pod tokenem – wykrycie kolizji
+                        cursor.execute(
+                            "INSERT INTO token_vault (tenant, anon_id, original_value, entity_type) VALUES "
+                            + ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+                            + " ON CONFLICT (tenant, anon_id) DO UPDATE SET anon_id = token_vault.anon_id"
+                            " RETURNING anon_id, original_value, entity_type",
+                            [value for token, (original_value, entity_type) in batch
+                             for value in (self.tenant, token, original_value, entity_type)]
+                        )
+                        collisions = [
+                            anon_id for anon_id, original_value, entity_type in cursor.fetchall()
+                            if pending[anon_id] != (original_value, entity_type)
+                        ]
+                        collision_count += len(collisions)
+                        if collisions:
+                            logger.warning("Kolizja tokenów w sejfie (tenant %s): %s", self.tenant, collisions)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                with self._lock:
+                    # Mapowania wracają do bufora – kolejna próba przy następnym zapisie
+                    self._pending = {**pending, **self._pending}
+                    self._flushing = {}
+                    self._stats["errors"] += 1
+                raise
+            finally:
+                self.pool.putconn(conn)
+            with self._lock:
+                self._flushing = {}
+                for token in pending:
+                    self._written[token] = True
+                while len(self._written) > self.remembered:
+                    self._written.popitem(last=False)
+                self._stats["written"] += len(pending)
+                self._stats["flushes"] += 1
+                self._stats["collisions"] += collision_count
+            return len(pending)
+
+    def lookup(self, tokens) -> dict:
+        """Zwraca {token: oryginalna wartość} dla tokenów z bufora i (brakujących) z tabeli token_vault."""
+        tokens = set(tokens)
+        with self._lock:
+            buffered = {**self._flushing, **self._pending}
+            mappings = {token: buffered[token][0] for token in tokens if token in buffered}
+        missing = [token for token in tokens if token not in mappings]
+        if missing:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT anon_id, original_value FROM token_vault WHERE tenant = %s AND anon_id = ANY(%s)",
+                        (self.tenant, missing)
+                    )
+                    mappings.update(cursor.fetchall())
+                conn.commit()
+            finally:
+                self.pool.putconn(conn)
+        return mappings
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tenant": self.tenant, "pending": len(self._pending), **self._stats}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Błąd zapisu sejfu tokenów: %s", e)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="token-vault", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Zatrzymuje wątek zapisu i zapisuje pozostałe mapowania."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,112 @@
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def parse_session_id(value) -> str:
+    """Waliduje identyfikator sesji podany przez klienta i zwraca go w postaci kanonicznej (ValueError, gdy niepoprawny)."""
+    if not isinstance(value, str):
+        raise ValueError("session_id must be a UUID string")
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise ValueError(f"Invalid session_id: {value!r}") from None
+
+
+class _SessionState:
+    __slots__ = ("opened_at", "tokens")
+
+    def __init__(self, opened_at: datetime):
+        self.opened_at = opened_at
+        self.tokens = {}  # (fragment, typ) -> token
+
+
+class SessionRegistry:
+    """
+    Rejestr sesji anonimizacji (tabela sessions) z pamięcią podręczną procesu.
+
+    Sesja otwierana jest jawnie (open) albo niejawnie przy pierwszym zapisie mapowań
+    pod identyfikatorem podanym przez klienta. Moment otwarcia sesji jest wartością
+    created_at wszystkich jej mapowań – sesja leży w jednej partycji dziennej.
+    Dla ostatnio używanych sesji przechowywane są moment otwarcia oraz przydzielone
+    tokeny, więc powtarzająca się wartość nie wymaga zapytania do bazy.
+    """
+
+    def __init__(self, max_cached: int = 10000, retention_days: int = 0, max_tokens_per_session: int = 10000):
+        self.max_cached = max_cached
+        self.retention_days = retention_days
+        self.max_tokens_per_session = max_tokens_per_session
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session_id -> _SessionState (LRU)
+
+    def open(self, conn, session_id: str = None, commit: bool = True) -> tuple:
+        """
+        Otwiera sesję (lub zwraca istniejącą) i zwraca krotkę (session_id, opened_at).
+        Znana sesja nie wymaga zapytania do bazy. Z commit=False wiersz sesji pozostaje
+        w transakcji wywołującego (zatwierdzany razem z mapowaniami); przy jej wycofaniu
+        wywołujący usuwa sesję z pamięci podręcznej (forget).
+        """
+        session_id = session_id or str(uuid.uuid4())
+        with self._lock:
+            state = self._get(session_id)
+            if state is not None:
+                return session_id, state.opened_at
+        with conn.cursor() as cursor:
+            # DO UPDATE (bez zmiany wartości) zwraca opened_at także dla istniejącej sesji
+            cursor.execute(
+                "INSERT INTO sessions (session_id) VALUES (%s) "
+                "ON CONFLICT (session_id) DO UPDATE SET session_id = EXCLUDED.session_id "
+                "RETURNING opened_at",
+                (session_id,)
+            )
+            opened_at = cursor.fetchone()[0]
+        if commit:
+            conn.commit()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state.opened_at != opened_at:
+                self._sessions[session_id] = _SessionState(opened_at)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_cached:
+                self._sessions.popitem(last=False)
+        return session_id, opened_at
+
+    def forget(self, session_id: str) -> None:
+        """Usuwa sesję z pamięci podręcznej (np. po wycofaniu transakcji, w której została otwarta)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def cached_tokens(self, session_id: str, keys) -> dict:
+        """Zwraca znane tokeny sesji dla podanych kluczy (fragment, typ)."""
+        with self._lock:
+            state = self._get(session_id)
+            if state is None:
+                return {}
+            return {key: state.tokens[key] for key in keys if key in state.tokens}
+
+    def remember_tokens(self, session_id: str, tokens: dict) -> None:
+        """Zapamiętuje tokeny zapisane w bazie (do limitu max_tokens_per_session na sesję)."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return
+            for key, token in tokens.items():
+                if len(state.tokens) >= self.max_tokens_per_session:
+                    break
+                state.tokens[key] = token
+
+    def _get(self, session_id: str):
+        """Stan sesji z pamięci podręcznej (wywoływane z założoną blokadą)."""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        # Sesja starsza niż retencja mogła zostać usunięta – weryfikacja w bazie
+        if self.retention_days > 0 and state.opened_at < datetime.now(timezone.utc) - timedelta(days=self.retention_days):
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return state
@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Przybliżony koszt pamięciowy wpisu: klucz, węzeł LRU i lista oraz koszt jednego fragmentu (krotka + typ)
+ENTRY_OVERHEAD_BYTES = 200
+SPAN_BYTES = 120
+
+
+def detector_config_version(*parts) -> str:
+    """Skrót konfiguracji detekcji (wzorce, słowniki, priorytety) – zmiana konfiguracji unieważnia wpisy."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class SpanCache:
+    """
+    Pamięć podręczna LRU wyników detekcji adresowana treścią: klucz to skrót znormalizowanego
+    tekstu i wersji konfiguracji detektorów, wartość to lista rozwiązanych fragmentów
+    (start, end, typ encji). Nie przechowuje tokenów ani samego tekstu, więc wpis jest
+    niezależny od sesji. Rozmiar ograniczony szacowaną zajętością pamięci (max_bytes).
+    """
+
+    def __init__(self, max_bytes: int, version: str = ""):
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # klucz -> (fragmenty, koszt)
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def __bool__(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b((self.version + "\0" + text).encode("utf-8"), digest_size=16).digest()
+
+    def get(self, text: str) -> Optional[list]:
+        """Fragmenty (start, end, typ) dla tekstu albo None, gdy tekstu nie ma w pamięci."""
+        if not self:
+            return None
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, text: str, spans: list) -> None:
+        if not self:
+            return
+        key = self.key(text)
+        spans = tuple(spans)
+        cost = ENTRY_OVERHEAD_BYTES + SPAN_BYTES * len(spans)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (spans, cost)
+            self._bytes += cost
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self._bytes -= evicted_cost
+                self._stats["evictions"] += 1
+
+    def invalidate(self, version: str = None) -> None:
+        """Usuwa wszystkie wpisy (np. po zmianie recognizerów); opcjonalnie ustawia nową wersję konfiguracji."""
+        with self._lock:
+            if version is not None:
+                self.version = version
+            self._entries.clear()
+            self._bytes = 0
+            self._stats["invalidations"] += 1
+        logger.info("Wyczyszczono pamięć podręczną wyników detekcji (wersja %s)", self.version)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self._stats,
+            }
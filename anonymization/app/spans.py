@@ -0,0 +1,67 @@
+def _prefix_sum(tree: list, index: int) -> int:
+    total = 0
+    while index > 0:
+        total += tree[index]
+        index &= index - 1
+    return total
+
+
+def _add(tree: list, index: int) -> None:
+    while index < len(tree):
+        tree[index] += 1
+        index += index & -index
+
+
+def resolve_overlaps(results: list, priority=()) -> list:
+    """
+    Rozwiązuje konflikty nakładających się fragmentów i zwraca zwycięzców posortowanych według pozycji.
+
+    Kandydaci są rozpatrywani od najlepszego: dłuższy fragment, następnie wyższy wynik,
+    następnie wyższy priorytet typu encji (kolejność w `priority`; typy spoza listy mają
+    najniższy priorytet). Kandydat nachodzący na już przyjęty fragment jest odrzucany.
+    Przyjęte fragmenty są rozłączne, więc kandydat [start, end) koliduje, gdy w [start, end)
+    zaczyna się przyjęty fragment albo przyjętych początków przed start jest więcej niż
+    końców do start (start leży wewnątrz przyjętego fragmentu). Liczniki początków i końców
+    w drzewach Fenwicka dają O(n log n) także w najgorszym przypadku.
+    """
+    rank = {entity_type: index for index, entity_type in enumerate(priority)}
+    lowest = len(rank)
+    # Pozycje skompresowane do indeksów 1..m (indeksowanie drzew Fenwicka)
+    index_of = {
+        position: index
+        for index, position in enumerate(sorted({p for res in results for p in (res.start, res.end)}), 1)
+    }
+    starts = [0] * (len(index_of) + 1)
+    ends = [0] * (len(index_of) + 1)
+    selected = []
+    for res in sorted(results, key=lambda r: (r.start - r.end, -r.score, rank.get(r.entity_type, lowest), r.start)):
+        start, end = index_of[res.start], index_of[res.end]
+        starts_before = _prefix_sum(starts, start - 1)
+        if _prefix_sum(starts, end - 1) > starts_before or starts_before > _prefix_sum(ends, start):
+            continue
+        _add(starts, start)
+        _add(ends, end)
+        selected.append(res)
+    selected.sort(key=lambda r: r.start)
+    return selected
+
+
+def rewrite_spans(text: str, replacements: list) -> str:
+    """
+    Zastępuje fragmenty tekstu w jednym liniowym przejściu.
+
+    `replacements` to lista krotek (start, end, zamiennik) z przesunięciami względem
+    oryginalnego tekstu. Fragmenty są przetwarzane według pozycji; fragment nachodzący
+    na już zastąpiony (wcześniejszy lub – przy tym samym początku – dłuższy) jest pomijany,
+    dzięki czemu wstawione tokeny nigdy nie są modyfikowane.
+    """
+    parts = []
+    cursor = 0
+    for start, end, replacement in sorted(replacements, key=lambda r: (r[0], -r[1])):
+        if start < cursor:
+            continue
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
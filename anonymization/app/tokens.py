@@ -0,0 +1,51 @@
+import re
+import threading
+from collections import deque
+from typing import Callable, Iterable
+
+# Alfabet treści tokenu (base36, małe litery). Pierwszy znak tokenu z alokatora należy do zakresu g–z,
+# więc tokeny z sekwencji nigdy nie pokrywają się z dawnymi tokenami losowymi (anno_ + 8 znaków hex).
+TOKEN_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+_FIRST_DIGIT_OFFSET = 16
+
+
+def token_regex(prefix: str, *lengths: int) -> re.Pattern:
+    """Wzorzec tokenu: prefiks i dowolna z długości `lengths` znaków alfabetu (obejmuje także tokeny hex i HMAC)."""
+    body = "|".join(f"[0-9a-z]{{{length}}}" for length in sorted(set(lengths), reverse=True))
+    return re.compile(rf"(?<!\w){re.escape(prefix)}(?:{body})(?!\w)")
+
+
+class TokenAllocator:
+    """
+    Przydział krótkich tokenów bez kolizji: identyfikatory pochodzą z sekwencji bazy
+    (unikalne we wszystkich procesach), a proces rezerwuje je blokami – jedno zapytanie
+    na `block_size` tokenów zamiast sprawdzania unikalności każdego tokenu.
+    """
+
+    def __init__(self, reserve: Callable[[int], Iterable[int]], block_size: int = 1000,
+                 prefix: str = "anno_", length: int = 8):
+        self.reserve = reserve
+        self.block_size = block_size
+        self.prefix = prefix
+        self.length = length
+        self._offset = _FIRST_DIGIT_OFFSET * len(TOKEN_ALPHABET) ** (length - 1)
+        self._limit = len(TOKEN_ALPHABET) ** length
+        self._lock = threading.Lock()
+        self._ids = deque()
+
+    def encode(self, number: int) -> str:
+        value = number + self._offset
+        if value >= self._limit:
+            raise RuntimeError("Token space exhausted, increase TOKEN_LENGTH")
+        digits = []
+        for _ in range(self.length):
+            value, digit = divmod(value, len(TOKEN_ALPHABET))
+            digits.append(TOKEN_ALPHABET[digit])
+        return self.prefix + "".join(reversed(digits))
+
+    def allocate(self, count: int) -> list:
+        """Zwraca `count` nowych tokenów; brakujące identyfikatory rezerwowane są kolejnym blokiem."""
+        with self._lock:
+            while len(self._ids) < count:
+                self._ids.extend(self.reserve(max(self.block_size, count - len(self._ids))))
+            return [self.encode(self._ids.popleft()) for _ in range(count)]
@@ -0,0 +1,66 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, List
+from fastapi import HTTPException
+
+# Równoległe przetwarzanie liści dokumentu pojedynczymi żądaniami (gdy punkty wsadowe są niedostępne)
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))  # maks. równoległych żądań na dokument
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "64"))  # globalny budżet procesu bramki
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+
+class InflightBudget:
+    """
+    Globalny budżet równoległych żądań do anonymization_service.
+    Dokument rezerwuje swoje miejsca z góry; gdy budżet jest wyczerpany, bramka odpowiada 429
+    z nagłówkiem Retry-After zamiast kolejkować kolejne żądania.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.in_use = 0
+
+    def acquire(self, slots: int) -> int:
+        # Pętla zdarzeń jest jednowątkowa – sprawdzenie i rezerwacja są niepodzielne
+        slots = min(slots, self.limit)
+        if self.in_use + slots > self.limit:
+            raise HTTPException(
+                status_code=429,
+                detail="Zbyt wiele równoległych żądań – spróbuj ponownie później",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        self.in_use += slots
+        return slots
+
+    def release(self, slots: int) -> None:
+        self.in_use -= slots
+
+
+inflight_budget = InflightBudget(MAX_INFLIGHT_REQUESTS)
+
+
+async def fan_out(items: List, func: Callable[..., Awaitable], concurrency: int = FANOUT_CONCURRENCY,
+                  budget: InflightBudget = inflight_budget) -> List:
+    """
+    Wywołuje func(item) dla wszystkich elementów równolegle (najwyżej `concurrency` naraz)
+    i zwraca wyniki w kolejności elementów. Błąd jednego wywołania przerywa pozostałe.
+    """
+    if not items:
+        return []
+    slots = budget.acquire(min(concurrency, len(items)))
+    semaphore = asyncio.Semaphore(slots)
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        budget.release(slots)
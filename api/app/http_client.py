@@ -0,0 +1,43 @@
+import os
+import httpx
+
+# Współdzielony klient HTTP do anonymization_service (pula połączeń keep-alive).
+# Tworzony przy starcie aplikacji i zamykany przy jej zatrzymaniu (patrz main.py).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # bezczynne połączenie zamykane po N s
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))  # odczyt, zapis i oczekiwanie na połączenie z puli (s)
+
+_client = None
+
+
+def create_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+async def start_client() -> None:
+    global _client
+    if _client is None:
+        _client = create_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Zwraca współdzielony klient (tworzony leniwie, gdy aplikacja działa bez zdarzeń startowych)."""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
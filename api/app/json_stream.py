@@ -0,0 +1,110 @@
+import json
+from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from app.path_rules import SKIP
+from app.stream_buffer import PendingOutput
+
+# Strumieniowy zapis JSON na podstawie zdarzeń parsera (ijson.basic_parse_async).
+# Wartości tekstowe zbierane są w partie i przekształcane (np. anonimizowane) jednym wywołaniem,
+# a wynik wysyłany jest na bieżąco – w pamięci pozostaje co najwyżej jedna partia.
+# Format wyjścia odpowiada json.dumps(..., ensure_ascii=False, indent=2).
+
+INDENT = "  "
+FLUSH_CHARS = 65536  # stałe wyjście (bez wartości czekających na przekształcenie) wysyłane po zebraniu tylu znaków
+
+
+def scalar_to_json(event: str, value) -> str:
+    if event == "number":
+        # Decimal zachowuje zapis liczby z dokumentu (np. 1.10)
+        return str(value) if isinstance(value, (int, Decimal)) else json.dumps(value)
+    if event == "boolean":
+        return "true" if value else "false"
+    return "null"
+
+
+async def stream_json(events: AsyncIterator[Tuple[str, object]],
+                      transform: Callable[[List[Tuple[str, Optional[str]]]], Awaitable[List[str]]],
+                      max_items: int, max_chars: int,
+                      root_member: Optional[Tuple[str, str]] = None,
+                      classify: Callable[[Tuple[str, ...]], Optional[str]] = None) -> AsyncIterator[bytes]:
+    """
+    Przekształca strumień zdarzeń JSON w strumień bajtów wynikowego dokumentu.
+
+    - wartości tekstowe (nie klucze) przekazywane są do `transform` partiami
+      ograniczonymi liczbą (`max_items`) i łączną długością (`max_chars`),
+    - `root_member` (klucz, wartość) jest wstawiany jako pierwsze pole obiektu głównego;
+      pole o tym samym kluczu w dokumencie wejściowym jest pomijane,
+    - `classify(ścieżka)` (np. PathRules.match) zwraca SKIP (wartość bez zmian), typ encji
+      (wartość przekazywana z tym typem) albo None (zwykła detekcja).
+    """
+    output = PendingOutput(transform, lambda value: json.dumps(value, ensure_ascii=False))
+    emit = output.write
+    stack = []    # liczba elementów w każdym otwartym kontenerze
+    in_map = []   # czy kontener jest obiektem
+    keys = []     # bieżący klucz obiektu (None dla tablic)
+    skip = 0      # głębokość pomijanej wartości (pole root_member z dokumentu wejściowego)
+    skipping = False
+
+    def current_path() -> Tuple[str, ...]:
+        # Klucze obiektów; element tablicy oznaczany przez "[]" po kluczu tablicy
+        segments = []
+        for is_map, key in zip(in_map, keys):
+            if is_map:
+                segments.append(key)
+            else:
+                segments[-1:] = [(segments[-1] if segments else "") + "[]"]
+        return tuple(segments)
+
+    def begin_value() -> None:
+        # Elementy tablic poprzedzone są separatorem i wcięciem; wartości pól – kluczem (map_key)
+        if stack and not in_map[-1]:
+            emit(("," if stack[-1] else "") + "\n" + INDENT * len(stack))
+            stack[-1] += 1
+
+    async for event, value in events:
+        if skipping:
+            if event in ("start_map", "start_array"):
+                skip += 1
+            elif event in ("end_map", "end_array"):
+                skip -= 1
+            skipping = skip > 0
+            continue
+
+        if event == "map_key":
+            if root_member is not None and len(stack) == 1 and value == root_member[0]:
+                skipping = True
+                continue
+            emit(("," if stack[-1] else "") + "\n" + INDENT * len(stack) + json.dumps(value, ensure_ascii=False) + ": ")
+            stack[-1] += 1
+            keys[-1] = value
+        elif event in ("start_map", "start_array"):
+            begin_value()
+            emit("{" if event == "start_map" else "[")
+            stack.append(0)
+            in_map.append(event == "start_map")
+            keys.append(None)
+            if root_member is not None and len(stack) == 1 and event == "start_map":
+                key, member = root_member
+                emit("\n" + INDENT + json.dumps(key, ensure_ascii=False) + ": " + json.dumps(member, ensure_ascii=False))
+                stack[-1] += 1
+        elif event in ("end_map", "end_array"):
+            count = stack.pop()
+            in_map.pop()
+            keys.pop()
+            emit(("\n" + INDENT * len(stack) if count else "") + ("}" if event == "end_map" else "]"))
+        elif event == "string":
+            begin_value()
+            action = classify(current_path()) if classify and value else None
+            if value and action != SKIP:
+                output.write_value(value, entity_type=action)
+            else:
+                emit(json.dumps(value, ensure_ascii=False))
+        else:
+            begin_value()
+            emit(scalar_to_json(event, value))
+
+        if output.full(max_items, max_chars, FLUSH_CHARS):
+            yield await output.render()
+
+    if output.parts:
+        yield await output.render()
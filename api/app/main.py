@@ -1,11 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
+from app.http_client import close_client, start_client
 from app.routes import router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jeden klient HTTP (z pulą połączeń) na cały proces bramki
+    await start_client()
+    yield
+    await close_client()
+
 app = FastAPI(
     title="Anonymization API",
     description="API umożliwiające anonimizację oraz deanonimizację danych poprzez upload plików",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Dołączenie routera zawierającego endpointy /upload oraz /upload-deanonymize
@@ -0,0 +1,91 @@
+import os
+import json
+from typing import Iterable, Optional, Tuple
+
+# Reguły ścieżek dla dokumentów JSON/FHIR i XML: wartości pod znanymi ścieżkami strukturalnymi
+# nie są anonimizowane (SKIP), a wartości pod znanymi ścieżkami z danymi osobowymi
+# zastępowane są tokenem od razu jako podany typ encji – bez detekcji i modelu NLP.
+#
+# Ścieżka to segmenty oddzielone kropkami, dopasowywane do końca ścieżki wartości:
+# - JSON: klucze, a element tablicy oznaczany jest przez "[]" po kluczu, np. "name[].family",
+# - XML: lokalne nazwy elementów, a atrybut jako "@nazwa", np. "telecom.@value",
+# - "*" pasuje do dowolnego pojedynczego segmentu.
+# Plik reguł (PATH_RULES_FILE): {"skip": [ścieżki], "entities": {ścieżka: typ encji}}.
+
+PATH_RULES_FILE = os.getenv("PATH_RULES_FILE", "")
+PATH_RULES_CACHE_SIZE = 10000
+
+SKIP = "SKIP"
+
+# Reguły domyślne obejmują tylko ścieżki czysto strukturalne (typ zasobu, płeć, kody i systemy kodowania)
+# oraz pola, których typ encji nie zależy od danych. Pozostałe ścieżki – np. id, reference, url
+# (często numery pacjenta: "Patient/12345678") czy telecom (telefon, e-mail albo URL zależnie od
+# "system") – przechodzą przez detekcję; wdrożenie może je dodać w PATH_RULES_FILE.
+DEFAULT_RULES = {
+    "skip": [
+        # FHIR
+        "resourceType", "gender", "use", "system", "country", "code",
+        # CDA (atrybuty kodowe)
+        "@code", "@codeSystem", "@use", "@classCode", "@moodCode", "@typeCode", "@determinerCode",
+    ],
+    "entities": {
+        # FHIR
+        "name[].family": "PERSON",
+        "name[].given[]": "PERSON",
+        "name[].text": "PERSON",
+        "birthDate": "DATE",
+        "address[].line[]": "STREET",
+        "address[].city": "LOCATION",
+        "address[].postalCode": "ZIP_CODE",
+        # CDA
+        "name.given": "PERSON",
+        "name.family": "PERSON",
+        "birthTime.@value": "DATE",
+        "addr.streetAddressLine": "STREET",
+        "addr.city": "LOCATION",
+        "addr.postalCode": "ZIP_CODE",
+    },
+}
+
+
+class PathRules:
+    """Dopasowanie ścieżek wartości do reguł; wynik dla powtarzających się ścieżek jest zapamiętywany."""
+
+    def __init__(self, skip: Iterable[str] = (), entities: dict = None):
+        # Reguły jako odwrócone krotki segmentów; dłuższa (bardziej szczegółowa) reguła wygrywa
+        rules = [(tuple(reversed(path.split("."))), SKIP) for path in skip]
+        rules += [(tuple(reversed(path.split("."))), entity) for path, entity in (entities or {}).items()]
+        self._rules = sorted(rules, key=lambda rule: -len(rule[0]))
+        self._cache = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def match(self, path: Tuple[str, ...]) -> Optional[str]:
+        """Zwraca SKIP, typ encji albo None (wartość przechodzi przez zwykłą detekcję)."""
+        if path in self._cache:
+            return self._cache[path]
+        result = None
+        reversed_path = path[::-1]
+        for segments, action in self._rules:
+            if len(segments) <= len(reversed_path) and all(
+                segment == "*" or segment == part for segment, part in zip(segments, reversed_path)
+            ):
+                result = action
+                break
+        if len(self._cache) >= PATH_RULES_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[path] = result
+        return result
+
+
+def load_path_rules(path: str = PATH_RULES_FILE) -> PathRules:
+    """Reguły z pliku JSON albo reguły domyślne (FHIR i CDA), gdy plik nie jest podany."""
+    if not path:
+        return PathRules(DEFAULT_RULES["skip"], DEFAULT_RULES["entities"])
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    return PathRules(rules.get("skip", []), rules.get("entities", {}))
+
+
+path_rules = load_path_rules()
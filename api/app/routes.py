@@ -1,27 +1,49 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from fastapi.responses import StreamingResponse
 import io
 import json
+import os
+import re
+import codecs
 import xml.etree.ElementTree as ET
-import requests
-import uuid
+import httpx
+import ijson
+from app.fanout import fan_out
+from app.http_client import get_client
+from app.json_stream import stream_json
+from app.path_rules import path_rules
+from app.xml_stream import stream_xml
 
 router = APIRouter()
 
 ANONYMIZATION_URL = "http://anonymization_service:8001"
 
+# Limity pojedynczego żądania /anonymize/batch (liczba tekstów i łączna liczba znaków)
+BATCH_MAX_ITEMS = int(os.getenv("ANONYMIZE_BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CHARS = int(os.getenv("ANONYMIZE_BATCH_MAX_CHARS", "200000"))
+# Punkty wsadowe anonymization_service; wyłączone (lub niedostępne – 404) oznaczają
+# przetwarzanie liści pojedynczymi żądaniami wysyłanymi równolegle (patrz fanout.py)
+USE_BATCH_ENDPOINTS = os.getenv("USE_BATCH_ENDPOINTS", "true").lower() in ("1", "true", "yes")
+batch_endpoints = {}  # ścieżka -> dostępność wykryta w trakcie działania
+# Strumieniowa anonimizacja plików TXT: rozmiar odczytu (bajty) i maks. długość fragmentu (znaki)
+TXT_READ_SIZE = int(os.getenv("TXT_READ_SIZE", "65536"))
+TXT_CHUNK_MAX_CHARS = int(os.getenv("TXT_CHUNK_MAX_CHARS", "20000"))
+# Koniec zdania: znak interpunkcyjny (ew. z cudzysłowem lub nawiasem) i odstęp
+SENTENCE_END = re.compile(r"[.!?…][\"')\]]*\s+")
+# Obsługiwane formaty plików (/upload i /upload-deanonymize)
+UPLOAD_EXTENSIONS = (".json", ".fhir", ".xml", ".txt")
+# Prefiks tokenów (TOKEN_PREFIX usługi anonimizacji) – teksty bez niego nie wymagają deanonimizacji
+TOKEN_MARKER = os.getenv("TOKEN_PREFIX", "anno_")
+
 
 @router.post("/anonymize")
-def anonymize(data: dict) -> Dict[str, Any]:
-    response = requests.post(f"{ANONYMIZATION_URL}/anonymize", json=data)
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail="Błąd komunikacji z anonymization_service")
-    return response.json()
+async def anonymize(data: dict) -> Dict[str, Any]:
+    return await post_to_service("/anonymize", data)
 
 
 @router.post("/deanonymize")
-def deanonymize(data: dict) -> Dict[str, Any]:
+async def deanonymize(data: dict) -> Dict[str, Any]:
     """Endpoint do przywracania oryginalnych wartości na podstawie session_id."""
     session_id = data.get("session_id", "")
     text = data.get("text", "")
@@ -29,12 +51,7 @@ def deanonymize(data: dict) -> Dict[str, Any]:
     if not session_id or not text:
         raise HTTPException(status_code=400, detail="session_id and text are required")
     
-    response = requests.post(f"{ANONYMIZATION_URL}/deanonymize", json={"session_id": session_id, "text": text})
-    
-    if response.status_code == 200:
-        return response.json()
-    
-    raise HTTPException(status_code=response.status_code, detail="Błąd komunikacji z anonymization_service")
+    return await post_to_service("/deanonymize", {"session_id": session_id, "text": text})
 
 
 @router.post("/upload")
@@ -44,47 +61,37 @@ async def upload_file(file: UploadFile = File(...)) -> StreamingResponse:
     i zwraca plik do pobrania (download) z dołączonym session_id,
     dzięki czemu plik jest gotowy do deanonimizacji.
     """
-    session_id = str(uuid.uuid4())
-    
     try:
-        content = await file.read()
         filename = file.filename.lower() if file.filename else ""
+        # Format sprawdzany przed otwarciem sesji – nieobsługiwany plik nie tworzy sesji w usłudze
+        if not filename.endswith(UPLOAD_EXTENSIONS):
+            raise HTTPException(status_code=415, detail="Unsupported file format")
+        session_id = await open_session_via_api()
         
         if filename.endswith((".json", ".fhir")):
-            # Pliki JSON i FHIR traktujemy jako JSON
-            data = json.loads(content.decode("utf-8"))
-            processed_data = process_json(data, session_id)
-            # Dołączamy session_id do obiektu JSON, aby był gotowy do deanonimizacji
-            if isinstance(processed_data, dict):
-                processed_data["session_id"] = session_id
-            file_content = json.dumps(processed_data, ensure_ascii=False, indent=2)
-            file_bytes = io.BytesIO(file_content.encode("utf-8"))
+            # Pliki JSON i FHIR: parsowanie zdarzeniowe i zapis strumieniowy; session_id jako pierwsze pole
+            # obiektu głównego, aby plik był gotowy do deanonimizacji
+            stream = stream_anonymized_json(file, session_id)
+            first = await stream.__anext__()  # błędy początku dokumentu zgłaszane jeszcze przed odpowiedzią
             headers = {"Content-Disposition": f"attachment; filename={session_id}.json"}
-            return StreamingResponse(file_bytes, media_type="application/json", headers=headers)
+            return StreamingResponse(prepend(first, stream), media_type="application/json", headers=headers)
         
         elif filename.endswith(".xml"):
-            root = ET.fromstring(content)
-            processed_xml = process_xml(root, session_id)
-            # Dodajemy nowy element <session_id> na początku XML
-            root.insert(0, ET.Element("session_id"))
-            root[0].text = session_id
-            final_xml = ET.tostring(root, encoding='unicode', method='xml')
-            file_bytes = io.BytesIO(final_xml.encode("utf-8"))
+            # Parsowanie przyrostowe i zapis strumieniowy; <session_id> jako pierwszy element potomny korzenia
+            stream = stream_anonymized_xml(file, session_id)
+            first = await stream.__anext__()
             headers = {"Content-Disposition": f"attachment; filename={session_id}.xml"}
-            return StreamingResponse(file_bytes, media_type="application/xml", headers=headers)
+            return StreamingResponse(prepend(first, stream), media_type="application/xml", headers=headers)
         
         elif filename.endswith(".txt"):
-            text = content.decode("utf-8")
-            processed_text = anonymize_text_via_api(text, session_id)
-            # Dodajemy linię z session_id na początku pliku tekstowego
-            final_text = f"SessionID: {session_id}\n" + processed_text
-            file_bytes = io.BytesIO(final_text.encode("utf-8"))
+            # Strumieniowo: plik czytany i anonimizowany fragmentami, wynik wysyłany na bieżąco
+            stream = stream_anonymized_text(file, session_id)
+            first = await stream.__anext__()
             headers = {"Content-Disposition": f"attachment; filename={session_id}.txt"}
-            return StreamingResponse(file_bytes, media_type="text/plain", headers=headers)
-        
-        else:
-            raise HTTPException(status_code=415, detail="Unsupported file format")
+            return StreamingResponse(prepend(first, stream), media_type="text/plain", headers=headers)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
@@ -97,18 +104,20 @@ async def upload_deanonymize_file(file: UploadFile = File(...)) -> StreamingResp
     Wynik jest zwracany jako plik do pobrania.
     """
     try:
-        content = await file.read()
         filename = file.filename.lower() if file.filename else ""
+        if not filename.endswith(UPLOAD_EXTENSIONS):
+            raise HTTPException(status_code=415, detail="Unsupported file format")
+        content = await file.read()
         
         # Przetwarzanie plików JSON/FHIR
         if filename.endswith((".json", ".fhir")):
             data = json.loads(content.decode("utf-8"))
-            if "session_id" in data:
+            if isinstance(data, dict) and "session_id" in data:
                 original_session = data["session_id"]
                 del data["session_id"]
             else:
                 raise HTTPException(status_code=400, detail="Brak session_id w pliku JSON do deanonimizacji")
-            processed_data = process_deanonymize_json(data, original_session)
+            processed_data = await process_deanonymize_json(data, original_session)
             # Możesz opcjonalnie dodać session_id do wyniku, jeśli potrzebujesz
             file_content = json.dumps(processed_data, ensure_ascii=False, indent=2)
             file_bytes = io.BytesIO(file_content.encode("utf-8"))
@@ -126,7 +135,7 @@ async def upload_deanonymize_file(file: UploadFile = File(...)) -> StreamingResp
                 root.remove(root[0])
             else:
                 raise HTTPException(status_code=400, detail="Brak session_id w XML do deanonimizacji")
-            processed_xml = process_deanonymize_xml(root, original_session)
+            processed_xml = await process_deanonymize_xml(root, original_session)
             file_bytes = io.BytesIO(processed_xml.encode("utf-8"))
             headers = {"Content-Disposition": f"attachment; filename={original_session}_deanon.xml"}
             return StreamingResponse(file_bytes, media_type="application/xml", headers=headers)
@@ -140,88 +149,317 @@ async def upload_deanonymize_file(file: UploadFile = File(...)) -> StreamingResp
                 text_to_process = "\n".join(lines[1:])  # usuń linię z sessionID
             else:
                 raise HTTPException(status_code=400, detail="Brak sessionID w pliku TXT do deanonimizacji")
-            processed_text = deanonymize_text_via_api(text_to_process, original_session)
+            processed_text = await deanonymize_text_via_api(text_to_process, original_session)
             # Zwracamy wynik bez dodatkowego dodawania sessionID
             file_bytes = io.BytesIO(processed_text.encode("utf-8"))
             headers = {"Content-Disposition": f"attachment; filename={original_session}_deanon.txt"}
             return StreamingResponse(file_bytes, media_type="text/plain", headers=headers)
-        
-        else:
-            raise HTTPException(status_code=415, detail="Unsupported file format")
     
+    except HTTPException:
+        raise
+    except (ValueError, ET.ParseError) as e:
+        # Niepoprawny JSON/XML lub kodowanie inne niż UTF-8 – błąd klienta, a nie usługi
+        raise HTTPException(status_code=400, detail=f"Invalid file content: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 
-# Rekurencyjne przetwarzanie JSON do anonimizacji
-def anonymize_text_in_json(data: Any, session_id: str) -> Any:
+def collect_json_leaves(data: Any, path: tuple = ()) -> List[tuple]:
+    """Zbiera niepuste wartości tekstowe JSON wraz ze ścieżkami (krotki kluczy i indeksów)."""
     if isinstance(data, dict):
-        return {key: anonymize_text_in_json(value, session_id) for key, value in data.items()}
+        return [leaf for key, value in data.items() for leaf in collect_json_leaves(value, path + (key,))]
     elif isinstance(data, list):
-        return [anonymize_text_in_json(item, session_id) for item in data]
-    elif isinstance(data, str):
-        return anonymize_text_via_api(data, session_id)
-    else:
-        return data
+        return [leaf for index, item in enumerate(data) for leaf in collect_json_leaves(item, path + (index,))]
+    elif isinstance(data, str) and data:
+        return [(path, data)]
+    return []
 
 
-def process_json(data: dict, session_id: str) -> Any:
-    """Anonimizacja danych w formacie JSON (np. FHIR)."""
-    return anonymize_text_in_json(data, session_id)
+def set_json_leaf(data: Any, path: tuple, value: Any) -> None:
+    for key in path[:-1]:
+        data = data[key]
+    data[path[-1]] = value
 
 
-# Rekurencyjna deanonimizacja JSON
-def deanonymize_text_in_json(data: Any, session_id: str) -> Any:
-    if isinstance(data, dict):
-        return {key: deanonymize_text_in_json(value, session_id) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [deanonymize_text_in_json(item, session_id) for item in data]
-    elif isinstance(data, str):
-        return deanonymize_text_via_api(data, session_id)
-    else:
-        return data
+# Deanonimizacja JSON: wszystkie wartości tekstowe dokumentu przywracane jednym żądaniem
+async def deanonymize_text_in_json(data: Any, session_id: str) -> Any:
+    if isinstance(data, str):
+        return (await deanonymize_texts_via_api([data], session_id))[0]
+    leaves = collect_json_leaves(data)
+    deanonymized = await deanonymize_texts_via_api([value for _, value in leaves], session_id)
+    for (path, _), value in zip(leaves, deanonymized):
+        set_json_leaf(data, path, value)
+    return data
 
 
-def process_deanonymize_json(data: dict, session_id: str) -> Any:
+async def process_deanonymize_json(data: dict, session_id: str) -> Any:
     """Deanonimizacja danych w formacie JSON."""
-    return deanonymize_text_in_json(data, session_id)
+    return await deanonymize_text_in_json(data, session_id)
 
 
-def process_xml(root: ET.Element, session_id: str) -> str:
-    """Anonimizacja danych w XML."""
+async def process_deanonymize_xml(root: ET.Element, session_id: str) -> str:
+    """Deanonimizacja danych w XML – teksty, teksty "tail" i wartości atrybutów (jedno żądanie na dokument)."""
+    slots = []  # (element, pole, nazwa atrybutu)
     for elem in root.iter():
         if elem.text:
-            elem.text = anonymize_text_via_api(elem.text, session_id)
+            slots.append((elem, "text", None))
+        if elem.tail:
+            slots.append((elem, "tail", None))
+        slots.extend((elem, "attrib", name) for name in elem.attrib)
+    values = [elem.attrib[name] if field == "attrib" else getattr(elem, field) for elem, field, name in slots]
+    deanonymized = await deanonymize_texts_via_api(values, session_id)
+    for (elem, field, name), value in zip(slots, deanonymized):
+        if field == "attrib":
+            elem.attrib[name] = value
+        else:
+            setattr(elem, field, value)
     return ET.tostring(root, encoding='unicode', method='xml')
 
 
-def process_deanonymize_xml(root: ET.Element, session_id: str) -> str:
-    """Deanonimizacja danych w XML."""
-    for elem in root.iter():
-        if elem.text:
-            elem.text = deanonymize_text_via_api(elem.text, session_id)
-    return ET.tostring(root, encoding='unicode', method='xml')
+async def post_to_service(path: str, payload: dict) -> Dict[str, Any]:
+    """Wysyła żądanie do anonymization_service współdzielonym klientem HTTP (bez blokowania pętli zdarzeń)."""
+    try:
+        response = await get_client().post(f"{ANONYMIZATION_URL}{path}", json=payload)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Przekroczono czas oczekiwania na anonymization_service")
+    except httpx.RequestError:
+        raise HTTPException(status_code=502, detail="Błąd komunikacji z anonymization_service")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Błąd komunikacji z anonymization_service")
+    return response.json()
+
+
+async def open_session_via_api() -> str:
+    """Otwiera nową sesję w anonymization_service; cały dokument anonimizowany jest w tej sesji."""
+    return (await post_to_service("/sessions", {}))["session_id"]
 
 
-def anonymize_text_via_api(text: str, session_id: str) -> str:
+async def anonymize_text_via_api(text: str, session_id: str) -> str:
     """Wysyła tekst do anonymization_service przez API."""
     if not text:
         raise HTTPException(status_code=400, detail="Text cannot be empty")
-    response = requests.post(f"{ANONYMIZATION_URL}/anonymize", json={"session_id": session_id, "text": text})
-    if response.status_code == 200:
-        result = response.json()
-        if "anonymized_text" in result:
-            return result["anonymized_text"]
-    raise HTTPException(status_code=response.status_code, detail="Błąd komunikacji z anonymization_service")
+    result = await post_to_service("/anonymize", {"session_id": session_id, "text": text})
+    return result["anonymized_text"]
 
 
-def deanonymize_text_via_api(text: str, session_id: str) -> str:
+async def deanonymize_text_via_api(text: str, session_id: str) -> str:
     """Wysyła tekst do anonymization_service w celu deanonimizacji przez API."""
     if not text:
         raise HTTPException(status_code=400, detail="Text cannot be empty")
-    response = requests.post(f"{ANONYMIZATION_URL}/deanonymize", json={"session_id": session_id, "text": text})
-    if response.status_code == 200:
-        result = response.json()
-        if "deanonymized_text" in result:
-            return result["deanonymized_text"]
-    raise HTTPException(status_code=response.status_code, detail="Błąd komunikacji z anonymization_service")
+    result = await post_to_service("/deanonymize", {"session_id": session_id, "text": text})
+    return result["deanonymized_text"]
+
+
+def split_batches(items: List, size=len) -> List[List]:
+    """Dzieli elementy na partie ograniczone liczbą elementów i łączną liczbą znaków."""
+    batches, batch, batch_chars = [], [], 0
+    for item in items:
+        if batch and (len(batch) >= BATCH_MAX_ITEMS or batch_chars + size(item) > BATCH_MAX_CHARS):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append(item)
+        batch_chars += size(item)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def cut_position(buffer: str, limit: int) -> int:
+    """Miejsce podziału bufora przed limitem: koniec akapitu, zdania, wiersza lub słowa (w tej kolejności)."""
+    window = buffer[:limit]
+    paragraph = window.rfind("\n\n")
+    if paragraph > 0:
+        return paragraph + 2
+    sentence = None
+    for sentence in SENTENCE_END.finditer(window):
+        pass
+    if sentence is not None:
+        return sentence.end()
+    for separator in ("\n", " "):
+        position = window.rfind(separator)
+        if position > 0:
+            return position + 1
+    return limit
+
+
+async def read_text_chunks(file: UploadFile, read_size: int = TXT_READ_SIZE,
+                           max_chars: int = TXT_CHUNK_MAX_CHARS) -> AsyncIterator[str]:
+    """Czyta plik UTF-8 porcjami i zwraca fragmenty tekstu (najwyżej max_chars) cięte na granicach akapitów i zdań."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    while True:
+        data = await file.read(read_size)
+        buffer += decoder.decode(data, final=not data)
+        while len(buffer) >= max_chars:
+            cut = cut_position(buffer, max_chars)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+        if not data:
+            break
+    if buffer:
+        yield buffer
+
+
+def split_whitespace(text: str) -> tuple:
+    """Dzieli tekst na (białe znaki na początku, treść, białe znaki na końcu) – usługa przycina białe znaki."""
+    core = text.strip()
+    if not core:
+        return text, "", ""
+    start = len(text) - len(text.lstrip())
+    return text[:start], core, text[start + len(core):]
+
+
+async def anonymize_chunk(chunk: str, session_id: str) -> str:
+    """Anonimizuje fragment, zachowując otaczające go białe znaki."""
+    leading, core, trailing = split_whitespace(chunk)
+    if not core:
+        return chunk
+    return leading + await anonymize_text_via_api(core, session_id) + trailing
+
+
+async def stream_anonymized_text(file: UploadFile, session_id: str) -> AsyncIterator[bytes]:
+    """
+    Generator odpowiedzi: linia z session_id, a następnie kolejne zanonimizowane fragmenty (ta sama sesja).
+    Linia z session_id wysyłana jest razem z pierwszym fragmentem, więc błąd usługi przy pierwszym
+    fragmencie trafia do klienta jako status odpowiedzi, a nie przerwana treść.
+    """
+    header = f"SessionID: {session_id}\n"
+    async for chunk in read_text_chunks(file):
+        yield (header + await anonymize_chunk(chunk, session_id)).encode("utf-8")
+        header = ""
+    if header:
+        yield header.encode("utf-8")
+
+
+def stream_anonymized_json(file: UploadFile, session_id: str) -> AsyncIterator[bytes]:
+    """Anonimizuje JSON w trakcie parsowania: wartości tekstowe wysyłane partiami, wynik zapisywany na bieżąco."""
+    return stream_json(
+        ijson.basic_parse_async(file),
+        lambda values: anonymize_values_via_api(values, session_id),
+        max_items=BATCH_MAX_ITEMS,
+        max_chars=BATCH_MAX_CHARS,
+        root_member=("session_id", session_id),
+        classify=path_rules.match if path_rules else None,
+    )
+
+
+def stream_anonymized_xml(file: UploadFile, session_id: str) -> AsyncIterator[bytes]:
+    """Anonimizuje XML w trakcie parsowania: teksty, "tail" i atrybuty wysyłane partiami, wynik zapisywany na bieżąco."""
+    return stream_xml(
+        read_chunks(file),
+        lambda values: anonymize_values_via_api(values, session_id),
+        max_items=BATCH_MAX_ITEMS,
+        max_chars=BATCH_MAX_CHARS,
+        first_child=("session_id", session_id),
+        classify=path_rules.match if path_rules else None,
+    )
+
+
+async def read_chunks(file: UploadFile, read_size: int = TXT_READ_SIZE) -> AsyncIterator[bytes]:
+    while True:
+        data = await file.read(read_size)
+        if not data:
+            break
+        yield data
+
+
+async def prepend(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield first
+    async for chunk in rest:
+        yield chunk
+
+
+async def post_batch(path: str, payload: dict) -> Optional[Dict[str, Any]]:
+    """Żądanie do punktu wsadowego; None, gdy punkt jest niedostępny (wtedy liście przetwarzane są równolegle)."""
+    if not batch_endpoints.get(path, USE_BATCH_ENDPOINTS):
+        return None
+    try:
+        return await post_to_service(path, payload)
+    except HTTPException as e:
+        if e.status_code not in (404, 405):
+            raise
+        # Starsza wersja anonymization_service – zapamiętujemy brak punktu wsadowego
+        batch_endpoints[path] = False
+        return None
+
+
+async def anonymize_texts_via_api(texts: List[str], session_id: str) -> List[str]:
+    """
+    Anonimizuje listę tekstów przez /anonymize/batch – powtarzające się wartości wysyłane są raz,
+    a całość w jak najmniejszej liczbie żądań o ograniczonym rozmiarze. Bez punktu wsadowego
+    teksty wysyłane są pojedynczo, równolegle. Białe znaki wokół tekstów są zachowywane
+    (np. wcięcia w XML). Wyniki w kolejności tekstów.
+    """
+    split_texts = [split_whitespace(text) for text in texts]
+    unique_texts = list(dict.fromkeys(core for _, core, _ in split_texts if core))
+    anonymized = {}
+    for batch in split_batches(unique_texts):
+        result = await post_batch("/anonymize/batch", {"session_id": session_id, "texts": batch})
+        if result is None:
+            break
+        anonymized.update(zip(batch, result["anonymized_texts"]))
+    remaining = [text for text in unique_texts if text not in anonymized]
+    if remaining:
+        results = await fan_out(remaining, lambda text: anonymize_text_via_api(text, session_id))
+        anonymized.update(zip(remaining, results))
+    return [
+        leading + anonymized[core] + trailing if core else leading
+        for leading, core, trailing in split_texts
+    ]
+
+
+async def anonymize_entities_via_api(values: List[tuple], session_id: str) -> List[str]:
+    """
+    Zastępuje tokenami wartości o typie encji znanym z reguł ścieżek (/anonymize/entities, bez detekcji).
+    Bez tego punktu wartości przechodzą przez zwykłą detekcję. Wyniki w kolejności wartości.
+    """
+    split_values = [(split_whitespace(text), entity_type) for text, entity_type in values]
+    unique_values = list(dict.fromkeys((core, entity_type) for (_, core, _), entity_type in split_values if core))
+    anonymized = {}
+    for batch in split_batches(unique_values, size=lambda value: len(value[0])):
+        entities = [{"text": text, "entity_type": entity_type} for text, entity_type in batch]
+        result = await post_batch("/anonymize/entities", {"session_id": session_id, "entities": entities})
+        if result is None:
+            break
+        anonymized.update(zip(batch, result["anonymized_texts"]))
+    remaining = [value for value in unique_values if value not in anonymized]
+    if remaining:
+        results = await anonymize_texts_via_api([text for text, _ in remaining], session_id)
+        anonymized.update(zip(remaining, results))
+    return [
+        leading + anonymized[(core, entity_type)] + trailing if core else leading
+        for (leading, core, trailing), entity_type in split_values
+    ]
+
+
+async def anonymize_values_via_api(values: List[tuple], session_id: str) -> List[str]:
+    """Anonimizuje pary (tekst, typ encji lub None) – z typem bez detekcji, bez typu przez detekcję."""
+    direct = [index for index, (_, entity_type) in enumerate(values) if entity_type]
+    detect = [index for index, (_, entity_type) in enumerate(values) if not entity_type]
+    results = [None] * len(values)
+    if direct:
+        tokens = await anonymize_entities_via_api([values[index] for index in direct], session_id)
+        for index, token in zip(direct, tokens):
+            results[index] = token
+    if detect:
+        texts = await anonymize_texts_via_api([values[index][0] for index in detect], session_id)
+        for index, text in zip(detect, texts):
+            results[index] = text
+    return results
+
+
+async def deanonymize_texts_via_api(texts: List[str], session_id: str) -> List[str]:
+    """
+    Deanonimizuje listę tekstów jednym żądaniem /deanonymize/batch (jeden odczyt mapowań sesji);
+    bez punktu wsadowego – pojedynczo, równolegle. Wysyłane są tylko teksty zawierające tokeny.
+    """
+    with_tokens = list(dict.fromkeys(text for text in texts if TOKEN_MARKER in text))
+    if not with_tokens:
+        return list(texts)
+    result = await post_batch("/deanonymize/batch", {"session_id": session_id, "texts": with_tokens})
+    if result is not None:
+        deanonymized = dict(zip(with_tokens, result["deanonymized_texts"]))
+    else:
+        results = await fan_out(with_tokens, lambda text: deanonymize_text_via_api(text, session_id))
+        deanonymized = dict(zip(with_tokens, results))
+    return [deanonymized.get(text, text) for text in texts]
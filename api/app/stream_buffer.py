@@ -0,0 +1,50 @@
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+
+class PendingOutput:
+    """
+    Bufor wyjścia strumieniowego: stałe fragmenty oraz wartości tekstowe czekające na przekształcenie
+    (np. anonimizację) jednym wywołaniem dla całej partii. Wartość może mieć z góry przypisany
+    typ encji (reguły ścieżek); transform otrzymuje listę par (wartość, typ encji lub None).
+    render() zwraca gotowy fragment wyjścia.
+    """
+
+    def __init__(self, transform: Callable[[List[Tuple[str, Optional[str]]]], Awaitable[List[str]]],
+                 encode_value: Callable[[str], str]):
+        self.transform = transform
+        self.encode_value = encode_value  # zapis wartości w formacie wyjścia (np. JSON, XML)
+        self.parts = []    # fragmenty wyjścia; krotka (indeks oczekującej wartości, funkcja zapisu)
+        self.pending = []  # pary (wartość, typ encji) czekające na przekształcenie
+        self.pending_chars = 0
+        self.buffered_chars = 0
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+        self.buffered_chars += len(text)
+
+    def write_value(self, value: str, encode: Callable[[str], str] = None, entity_type: str = None) -> None:
+        self.parts.append((len(self.pending), encode or self.encode_value))
+        self.pending.append((value, entity_type))
+        self.pending_chars += len(value)
+
+    def full(self, max_items: int, max_chars: int, flush_chars: int) -> bool:
+        """
+        Czy partia osiągnęła limit albo zebrano `flush_chars` znaków stałego wyjścia – także gdy
+        czekają wartości (np. jeden tekst, a po nim wartości pomijane regułami ścieżek); pamięć
+        bufora pozostaje ograniczona niezależnie od kształtu dokumentu.
+        """
+        return (
+            len(self.pending) >= max_items
+            or self.pending_chars >= max_chars
+            or self.buffered_chars >= flush_chars
+        )
+
+    async def render(self) -> bytes:
+        results = await self.transform(self.pending) if self.pending else []
+        out = "".join(
+            part[1](results[part[0]]) if isinstance(part, tuple) else part
+            for part in self.parts
+        )
+        self.parts, self.pending = [], []
+        self.pending_chars = self.buffered_chars = 0
+        return out.encode("utf-8")
@@ -1,4 +1,4 @@
-import requests
+import httpx
 import sys
 import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -12,6 +12,7 @@ file_path = "c:/Users/HopE/Desktop/Anonymisierungssystem/api/app/test.xml"
 
 with open(file_path, "rb") as file:
     files = {"file": (file_path, file)}
-    response = requests.post(url, files=files)
+    # Anonimizacja dużych plików może trwać dłużej niż domyślny limit czasu httpx
+    response = httpx.post(url, files=files, timeout=None)
 
 print(response.json())
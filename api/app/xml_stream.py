@@ -0,0 +1,141 @@
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from app.path_rules import SKIP
+from app.stream_buffer import PendingOutput
+
+# Strumieniowa anonimizacja XML (np. HL7 CDA) na podstawie zdarzeń XMLPullParser.
+# Teksty elementów, teksty "tail" i wartości atrybutów zbierane są w partie, wynik zapisywany
+# jest na bieżąco, a przetworzone elementy usuwane z drzewa – pamięć zależy od głębokości
+# dokumentu i rozmiaru partii, nie od jego długości.
+
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+XSI_NS = "http://www.w3.org/2001/XMLSchema-instance"
+FLUSH_CHARS = 65536
+
+
+def escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_attribute(text: str) -> str:
+    return (
+        escape_text(text).replace('"', "&quot;")
+        .replace("\n", "&#10;").replace("\r", "&#13;").replace("\t", "&#09;")
+    )
+
+
+def local_name(name: str) -> str:
+    return name.rsplit("}", 1)[-1]
+
+
+class _Frame:
+    __slots__ = ("elem", "last_child", "namespaces", "path")
+
+    def __init__(self, elem: ET.Element, namespaces: dict, path: tuple):
+        self.elem = elem
+        self.last_child = None
+        self.namespaces = namespaces  # prefiks -> URI widoczne w elemencie
+        self.path = path              # lokalne nazwy elementów od korzenia
+
+
+def qualified_name(name: str, namespaces: dict, attribute: bool = False) -> str:
+    """Zamienia nazwę '{uri}nazwa' na 'prefiks:nazwa' według zadeklarowanych przestrzeni nazw."""
+    if not name.startswith("{"):
+        return name
+    uri, local = name[1:].split("}", 1)
+    if uri == XML_NS:
+        return f"xml:{local}"
+    for prefix, declared in reversed(list(namespaces.items())):
+        # Atrybuty bez prefiksu nie należą do domyślnej przestrzeni nazw
+        if declared == uri and not (attribute and prefix == ""):
+            return f"{prefix}:{local}" if prefix else local
+    raise ValueError(f"Undeclared namespace: {uri}")
+
+
+async def stream_xml(chunks: AsyncIterator[bytes],
+                     transform: Callable[[List[Tuple[str, Optional[str]]]], Awaitable[List[str]]],
+                     max_items: int, max_chars: int,
+                     first_child: Optional[Tuple[str, str]] = None,
+                     classify: Callable[[Tuple[str, ...]], Optional[str]] = None) -> AsyncIterator[bytes]:
+    """
+    Przekształca dokument XML czytany porcjami w strumień bajtów wynikowego dokumentu.
+
+    - teksty, teksty "tail" i wartości atrybutów (poza atrybutami xsi) przekazywane są do `transform`
+      partiami ograniczonymi liczbą (`max_items`) i łączną długością (`max_chars`),
+    - `first_child` (znacznik, tekst) jest wstawiany jako pierwszy element potomny korzenia,
+    - `classify(ścieżka)` (np. PathRules.match) zwraca SKIP, typ encji albo None (zwykła detekcja);
+      ścieżką tekstu i tekstu "tail" jest ścieżka elementu-rodzica treści, atrybutu – ścieżka elementu i "@nazwa".
+    """
+    parser = ET.XMLPullParser(events=("start", "end", "start-ns"))
+    output = PendingOutput(transform, escape_text)
+    stack = []
+    declared = []  # deklaracje przestrzeni nazw dla następnego elementu
+
+    def write_value(value: str, path: tuple, encode) -> None:
+        action = classify(path) if classify and value.strip() else None
+        if value.strip() and action != SKIP:
+            output.write_value(value, encode, entity_type=action)
+        else:
+            output.write(encode(value))
+
+    def write_text(text: Optional[str], path: tuple) -> None:
+        if text:
+            write_value(text, path, escape_text)
+
+    def close_text(frame: _Frame) -> None:
+        """Zapisuje kompletny już tekst elementu albo tekst "tail" jego ostatniego dziecka."""
+        if frame.last_child is None:
+            write_text(frame.elem.text, frame.path)
+            frame.elem.text = None
+            if first_child is not None and len(stack) == 1 and frame is stack[0]:
+                tag, text = first_child
+                # Element bez przestrzeni nazw, także gdy korzeń deklaruje domyślną przestrzeń nazw
+                reset = ' xmlns=""' if frame.namespaces.get("") else ""
+                output.write(f"<{tag}{reset}>{escape_text(text)}</{tag}>")
+        else:
+            write_text(frame.last_child.tail, frame.path)
+            frame.elem.remove(frame.last_child)
+            frame.last_child = None
+
+    def handle(event: str, item) -> None:
+        nonlocal declared
+        if event == "start-ns":
+            declared.append(item)
+            return
+        if event == "start":
+            if stack:
+                close_text(stack[-1])
+            namespaces = dict(stack[-1].namespaces if stack else {})
+            path = (stack[-1].path if stack else ()) + (local_name(item.tag),)
+            namespaces.update(declared)
+            output.write("<" + qualified_name(item.tag, namespaces))
+            for prefix, uri in declared:
+                output.write(f' xmlns:{prefix}="{escape_attribute(uri)}"' if prefix else f' xmlns="{escape_attribute(uri)}"')
+            declared = []
+            for name, value in item.attrib.items():
+                output.write(f' {qualified_name(name, namespaces, attribute=True)}="')
+                if name.startswith("{" + XSI_NS + "}"):
+                    output.write(escape_attribute(value))
+                else:
+                    write_value(value, path + ("@" + local_name(name),), escape_attribute)
+                output.write('"')
+            output.write(">")
+            stack.append(_Frame(item, namespaces, path))
+            return
+        frame = stack.pop()
+        close_text(frame)
+        output.write(f"</{qualified_name(item.tag, frame.namespaces)}>")
+        if stack:
+            stack[-1].last_child = item
+
+    async for data in chunks:
+        parser.feed(data)
+        for event, item in parser.read_events():
+            handle(event, item)
+        if output.full(max_items, max_chars, FLUSH_CHARS):
+            yield await output.render()
+    parser.close()
+    for event, item in parser.read_events():
+        handle(event, item)
+    if output.parts:
+        yield await output.render()
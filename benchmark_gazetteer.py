@@ -0,0 +1,64 @@
+import re
+import random
+import string
+import time
+from anonymization.app.anonymizer import GERMAN_NAMES
+from anonymization.app.gazetteer import Gazetteer
+
+# Benchmark: scan time of the name gazetteer as the dictionary grows from 90 to 100k entries.
+# Run with: python benchmark_gazetteer.py
+
+SIZES = [len(GERMAN_NAMES), 1_000, 10_000, 100_000]
+REGEX_LOOP_MAX_SIZE = 1_000  # the per-name regex loop becomes impractically slow above this
+REPEAT = 20
+
+NOTE = (
+    "Patientin Elisabeth Maier, geb. 15. Januar 1950, wohnhaft Hauptstraße 12, 10115 Berlin. "
+    "Aufnahme durch Dr. Thomas Schmidt wegen akuter Dyspnoe. Angehörige: Ehemann Klaus, "
+    "Tochter Anna (Tel. +49 170 1234567). Vorbefunde aus dem Klinikum wurden von Frau Julia "
+    "Becker übermittelt; Rücksprache mit Hausarzt Michael Wagner am 03.04.2023 erfolgt.\n"
+)
+TEXT = NOTE * 20  # ~8 KB, typical multi-KB clinical note
+
+
+def synthetic_names(count: int) -> list:
+    """Deterministic, capitalised pseudo-names padded onto the built-in list."""
+    rng = random.Random(42)
+    names = list(GERMAN_NAMES)
+    seen = set(names)
+    while len(names) < count:
+        name = rng.choice(string.ascii_uppercase) + "".join(
+            rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))
+        )
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def time_it(func) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def regex_loop(names, text):
+    return [m.span() for name in names for m in re.finditer(r'\b' + re.escape(name) + r'\b', text)]
+
+
+if __name__ == "__main__":
+    print(f"Text length: {len(TEXT)} chars, {REPEAT} runs per measurement\n")
+    print(f"{'names':>8} | {'build (ms)':>10} | {'gazetteer scan (ms)':>19} | {'regex loop (ms)':>15}")
+    print("-" * 63)
+    for size in SIZES:
+        names = synthetic_names(size)
+        start = time.perf_counter()
+        gazetteer = Gazetteer(names)
+        build_ms = (time.perf_counter() - start) * 1000
+        scan_ms = time_it(lambda: list(gazetteer.finditer(TEXT)))
+        if size <= REGEX_LOOP_MAX_SIZE:
+            regex_ms = f"{time_it(lambda: regex_loop(names, TEXT)):15.2f}"
+        else:
+            regex_ms = f"{'skipped':>15}"
+        print(f"{size:>8} | {build_ms:10.1f} | {scan_ms:19.2f} | {regex_ms}")
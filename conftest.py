@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import itertools
+import uuid
+import httpx
+import psycopg2
+import pytest
+from anonymization.app.tokens import TokenAllocator
+
+# The gateway (api/) imports its modules as the "app" package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://anon_user:securepassword@db/anon_db")
+
+@pytest.fixture
+def db_conn():
+    """Connection whose search_path points to a throwaway schema (skipped without a database)."""
+    try:
+        connection = psycopg2.connect(DATABASE_URL, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Database not available: {e}")
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(f"SET search_path TO {schema}")
+    connection.commit()
+    yield connection
+    connection.rollback()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+    connection.commit()
+    connection.close()
+
+@pytest.fixture
+def local_tokens():
+    """Token allocator reserving ids from an in-process counter instead of the database sequence."""
+    ids = itertools.count(1)
+    return TokenAllocator(lambda count: [next(ids) for _ in range(count)], block_size=10)
+
+@pytest.fixture
+def gateway_service(monkeypatch):
+    """
+    Replaces the gateway's HTTP client with one answered by `handler(path, payload)` and returns
+    the list of (path, payload) requests. The handler returns a JSON body or (status code, body).
+    """
+    from app import http_client, routes
+    monkeypatch.setattr(routes, "batch_endpoints", {})
+    calls = []
+
+    def install(handler):
+        def respond(request):
+            payload = json.loads(request.content or b"{}")
+            calls.append((request.url.path, payload))
+            result = handler(request.url.path, payload)
+            status, body = result if isinstance(result, tuple) else (200, result)
+            return httpx.Response(status, json=body)
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(respond)))
+        return calls
+    return install
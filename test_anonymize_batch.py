@@ -0,0 +1,59 @@
+import uuid
+import logging
+import pytest
+from anonymization.app.anonymizer import TOKEN_REGEX, AnonymizationService
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+TEST_TEXTS = [
+    "Mein Name ist Eva und ich wohne in Hamburg.",
+    "male",
+    "Ich bin am 15. Januar 1910 geboren, Tel +49 170 1234567.",
+    "",
+    "Eva und Thomas sind meine Freunde.",
+]
+
+def recording_service(monkeypatch, allocator):
+    """Service whose save_mappings records calls instead of writing to the database."""
+    calls = []
+    monkeypatch.setattr(
+        AnonymizationService, "save_mappings",
+        lambda self, session_id, entity_mapping: calls.append((session_id, dict(entity_mapping))) or dict(entity_mapping)
+    )
+    service = AnonymizationService()
+    service.allocator = allocator
+    return service, calls
+
+def test_batch_matches_single_calls(monkeypatch, local_tokens):
+    """Batch output equals per-text anonymization, in order, apart from the random token values."""
+    service, _ = recording_service(monkeypatch, local_tokens)
+    session_id = str(uuid.uuid4())
+    batch = service.anonymize_batch(session_id, TEST_TEXTS)
+    single = [service.anonymize_text(session_id, text) for text in TEST_TEXTS]
+    assert [TOKEN_REGEX.sub("TOKEN", text) for text in batch] == [TOKEN_REGEX.sub("TOKEN", text) for text in single]
+
+def test_batch_writes_once_and_reuses_tokens(monkeypatch, local_tokens):
+    """All mappings of a batch are written in one call and a repeated value gets one token."""
+    service, calls = recording_service(monkeypatch, local_tokens)
+    session_id = str(uuid.uuid4())
+    batch = service.anonymize_batch(session_id, TEST_TEXTS)
+    assert len(calls) == 1 and calls[0][0] == session_id
+    eva_token = calls[0][1][("Eva", "PERSON")]
+    assert batch[0].count(eva_token) == 1 and batch[4].startswith(eva_token)
+
+def test_batch_without_entities_skips_database(monkeypatch, local_tokens):
+    """A batch with nothing to anonymize does not touch the database."""
+    service, calls = recording_service(monkeypatch, local_tokens)
+    assert service.anonymize_batch(str(uuid.uuid4()), ["male", "DE", "official"]) == ["male", "DE", "official"]
+    assert calls == []
+
+def test_typed_entities_skip_detection(monkeypatch, local_tokens):
+    """Values with a known entity type get tokens without running detection; a repeated value gets one token."""
+    service, calls = recording_service(monkeypatch, local_tokens)
+    monkeypatch.setattr(service.pipeline, "analyze_batch", lambda *args, **kwargs: pytest.fail("detection called"))
+    tokens = service.anonymize_entities(str(uuid.uuid4()), [("Eva", "PERSON"), ("1910-01-15", "DATE"), ("Eva", "PERSON")])
+    assert all(TOKEN_REGEX.fullmatch(token) for token in tokens)
+    assert tokens[0] == tokens[2] != tokens[1]
+    assert len(calls) == 1 and set(calls[0][1]) == {("Eva", "PERSON"), ("1910-01-15", "DATE")}
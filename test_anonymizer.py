@@ -1,8 +1,9 @@
 import sys
 import logging
-from anonymization.app.anonymizer import AnonymizationService, detect_dates, DATE_REGEX, detect_license_plates, LICENSE_PLATE_REGEX
+from anonymization.app.anonymizer import AnonymizationService, TOKEN_REGEX, detect_dates, DATE_REGEX, detect_license_plates, LICENSE_PLATE_REGEX
 import uuid
 import re
+from datetime import datetime, timezone
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -143,8 +144,8 @@ def test_anonymization_service():
             
             # Show which parts were anonymized
             for original, anonymized_text in zip([text], [anonymized]):
-                # Find all tokens in the anonymized text (format: anno_XXXXXXXX)
-                anon_tokens = re.findall(r'anno_[a-f0-9]{8}', anonymized_text)
+                # Find all tokens in the anonymized text (format: TOKEN_PREFIX + TOKEN_LENGTH characters)
+                anon_tokens = TOKEN_REGEX.findall(anonymized_text)
                 
                 if anon_tokens:
                     logger.info("Anonymized entities:")
@@ -206,12 +207,17 @@ class MockDBConnection:
     """Mock database connection for local testing without Docker."""
     def __init__(self):
         self.data = {}
+        self.sessions = {}
+        self.sequence = 0
         
     def cursor(self):
         return MockCursor(self)
         
     def commit(self):
         pass
+
+    def rollback(self):
+        pass
         
     def close(self):
         pass
@@ -220,22 +226,51 @@ class MockCursor:
     """Mock cursor for local testing without Docker."""
     def __init__(self, connection):
         self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
         
     def execute(self, query, params=None):
-        if "INSERT INTO" in query:
-            session_id, anon_id, original_value, entity_type = params
-            if session_id not in self.connection.data:
-                self.connection.data[session_id] = {}
-            self.connection.data[session_id][anon_id] = (original_value, entity_type)
-        elif "SELECT" in query:
-            self.last_query = query
-            self.last_params = params
+        self.last_query = query
+        self.last_params = params
+        if "INSERT INTO sessions" in query:
+            self.connection.sessions.setdefault(params[0], datetime.now(timezone.utc))
+        elif "INSERT INTO anonymization" in query:
+            # Multi-row upsert: parameters are flattened rows of five values; a value already
+            # stored in the session keeps its token (RETURNING yields the stored token)
+            self.returned = []
+            for i in range(0, len(params), 5):
+                session_id, anon_id, original_value, entity_type, created_at = params[i:i + 5]
+                if session_id not in self.connection.data:
+                    self.connection.data[session_id] = {}
+                stored = self.connection.data[session_id]
+                existing = [token for token, value in stored.items() if value == (original_value, entity_type)]
+                if existing:
+                    anon_id = existing[0]
+                stored[anon_id] = (original_value, entity_type)
+                self.returned.append((original_value, entity_type, anon_id))
             
     def fetchall(self):
-        if "SELECT anon_id, original_value FROM" in self.last_query:
-            session_id = self.last_params[0]
+        if "INSERT INTO sessions" in self.last_query:
+            return [(self.connection.sessions[self.last_params[0]],)]
+        elif "INSERT INTO anonymization" in self.last_query:
+            return self.returned
+        elif "nextval('anon_token_seq')" in self.last_query:
+            # Sequence block: the next `count` values of the token sequence
+            start = self.connection.sequence
+            self.connection.sequence += self.last_params[0]
+            return [(value,) for value in range(start + 1, self.connection.sequence + 1)]
+        elif "SELECT anon_id, original_value FROM" in self.last_query:
+            session_id, anon_ids = self.last_params[:2]
             if session_id in self.connection.data:
-                return [(anon_id, original_value) for anon_id, (original_value, _) in self.connection.data[session_id].items()]
+                return [
+                    (anon_id, original_value)
+                    for anon_id, (original_value, _) in self.connection.data[session_id].items()
+                    if anon_id in anon_ids
+                ]
             return []
         elif "SELECT original_value, entity_type FROM" in self.last_query:
             anon_id, session_id = self.last_params
@@ -262,8 +297,10 @@ def test_anonymization_service_local():
     original_get_db_connection = get_db_connection
     
     # Define a replacement function that returns our mock connection
+    # (one shared instance, so mappings written by anonymize_text are visible to deanonymize_text)
+    mock_connection = MockDBConnection()
     def mock_get_db_connection():
-        return MockDBConnection()
+        return mock_connection
     
     # Monkey patch the module
     import anonymization.app.anonymizer
@@ -300,7 +337,7 @@ def test_anonymization_service_local():
             logger.info(f"Anonymized: {anonymized}")
             
             # Show which parts were anonymized
-            anon_tokens = re.findall(r'anno_[a-f0-9]{8}', anonymized)
+            anon_tokens = TOKEN_REGEX.findall(anonymized)
             
             if anon_tokens:
                 logger.info("Anonymized entities:")
@@ -0,0 +1,133 @@
+import threading
+import time
+import logging
+import pytest
+from psycopg2 import extensions
+import anonymization.app.db as db
+from anonymization.app.db import ConnectionPool, PoolTimeout
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        if self.connection.broken:
+            raise Exception("server closed the connection unexpectedly")
+        self.connection.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection."""
+    def __init__(self, dsn):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    monkeypatch.setattr(db.psycopg2, "connect", FakeConnection)
+
+def test_reuses_connections_and_reports_stats():
+    """Connections are reused; min_size is opened up front."""
+    pool = ConnectionPool("dsn", min_size=2, max_size=4)
+    pool.open()
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    stats = pool.stats()
+    assert stats["created"] == 2 and stats["in_use"] == 1 and stats["idle"] == 1 and stats["checkouts"] == 2
+
+def test_checkout_timeout_when_exhausted():
+    """A full pool makes callers wait at most `timeout` seconds."""
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=0.1)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+def test_waiting_caller_gets_released_connection():
+    """A waiting caller is woken when a connection is returned."""
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=2)
+    conn = pool.getconn()
+    result = {}
+    waiter = threading.Thread(target=lambda: result.setdefault("conn", pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    assert pool.stats()["waiting"] == 1
+    pool.putconn(conn)
+    waiter.join()
+    assert result["conn"] is conn
+
+def test_recycles_after_max_uses():
+    """A connection is closed and replaced after max_uses checkouts."""
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, max_uses=2)
+    first = pool.getconn()
+    pool.putconn(first)
+    assert pool.getconn() is first
+    pool.putconn(first)
+    assert first.closed
+    assert pool.getconn() is not first
+    assert pool.stats()["recycled"] == 1
+
+def test_health_check_discards_broken_connection():
+    """Idle connections are pinged before reuse; broken ones are replaced."""
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, health_check_interval=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    assert pool.getconn() is not conn
+    assert pool.stats()["failed_health_checks"] == 1
+
+def test_open_transaction_is_rolled_back_on_release():
+    """A connection returned inside a transaction is rolled back before reuse."""
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+    conn = pool.getconn()
+    conn.cursor().execute("INSERT ...")
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+
+def test_foreign_connection_is_closed():
+    """Connections not handed out by the pool are simply closed."""
+    pool = ConnectionPool("dsn")
+    foreign = FakeConnection("dsn")
+    pool.putconn(foreign)
+    assert foreign.closed and pool.stats()["size"] == 0
+
+def test_failed_open_releases_unfilled_slots(monkeypatch):
+    """A connection failure during open keeps only the opened connections counted; checkout still works."""
+    attempts = []
+    def flaky_connect(dsn):
+        attempts.append(dsn)
+        if len(attempts) == 2:
+            raise Exception("could not connect to server")
+        return FakeConnection(dsn)
+    monkeypatch.setattr(db.psycopg2, "connect", flaky_connect)
+    pool = ConnectionPool("dsn", min_size=3, max_size=3, timeout=0.1)
+    with pytest.raises(Exception):
+        pool.open()
+    assert pool.stats()["size"] == 1 and pool.stats()["idle"] == 1
+    connections = [pool.getconn() for _ in range(3)]
+    assert len({id(conn) for conn in connections}) == 3 and pool.stats()["size"] == 3
@@ -0,0 +1,99 @@
+import logging
+from presidio_analyzer import AnalyzerEngine
+from anonymization.app.anonymizer import CUSTOM_DETECTORS, detection_engine, nlp_engine
+from anonymization.app.detection import DetectionPipeline, TriageCounters
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# Cases from test_anonymizer.py
+TEST_TEXTS = [
+    "Ich bin am 15. Januar 1910 geboren und wohne in Hauptstraße 123.",
+    "Ich bin am 15 Januar 1910 geboren und wohne in Hauptstraße 123.",
+    "Ich bin am 15 Jan 1910 geboren.",
+    "Das Treffen findet am 01. Mär. 2022 statt.",
+    "Termin: 15-03-2023",
+    "Datum: 2023-03-15",
+    "Fälligkeitsdatum: 15/03/2023",
+    "Geboren am 15.03.23",
+    "Mein Auto hat das Kennzeichen M AB 123 und ich wohne in Berlin.",
+    "Das Fahrzeug mit dem Kennzeichen B C 1 parkt in München.",
+    "Das Auto mit dem Kennzeichen MÜ X 99 gehört mir.",
+    "Ich habe ein Auto mit dem Kennzeichen S-XY 123.",
+    "BN-Z 7 ist das Kennzeichen meines Motorrads.",
+    "Mein Name ist Eva und ich wohne in Hamburg.",
+    "Emma und Thomas sind meine Freunde.",
+    "Elisa ist meine Schwester und sie wohnt in Frankfurt.",
+    "Elena und Michael arbeiten zusammen in Stuttgart.",
+    "Erica ist eine amerikanische Variante von Erika.",
+    "Mein Name ist Elisa, ich wohne in Hauptstraße 123, 10115 Berlin, " +
+    "mein Geburtsdatum ist 15.03.1985, meine Telefonnummer ist +49 170 1234567 " +
+    "und mein Auto hat das Kennzeichen B AB 123.",
+    "Mein Name ist Elisa, ich wohne in Hauptstraße 123, 10115 Berlin, " +
+    "mein Geburtsdatum ist 15. Jan. 1985, meine Telefonnummer ist +49 170 1234567 " +
+    "und mein Auto hat das Kennzeichen B AB 123.",
+]
+
+ALL_ENTITIES = {detector.entity_type for detector in CUSTOM_DETECTORS}
+
+def spans(results):
+    return {(r.start, r.end, r.entity_type) for r in results}
+
+def build_pipeline(presidio_hosted):
+    """Fresh analyzer sharing the loaded NLP engine, so hosted recognizers do not leak between pipelines."""
+    analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["de"])
+    return DetectionPipeline(analyzer, CUSTOM_DETECTORS, presidio_hosted=presidio_hosted)
+
+def legacy_detect(plain_analyzer, text):
+    """Previous anonymize_text: every custom detector by hand, then the NLP analyzer."""
+    return detection_engine.detect(text) + plain_analyzer.analyze(text=text, language="de")
+
+def test_pipeline_parity():
+    """Native, Presidio-hosted and mixed pipelines return the same spans as the previous double run."""
+    plain_analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["de"])
+    pipelines = {
+        "native": build_pipeline(set()),
+        "presidio": build_pipeline(ALL_ENTITIES),
+        "mixed": build_pipeline({"STREET", "PERSON", "DATE"}),
+    }
+    for text in TEST_TEXTS:
+        expected = spans(legacy_detect(plain_analyzer, text))
+        for name, pipeline in pipelines.items():
+            found = spans(pipeline.analyze(text))
+            assert found == expected, f"{name}: {text}: {found ^ expected}"
+        logger.info(f"✓ Parity for '{text}'")
+
+def test_each_detector_hosted_once():
+    """A detector lives either in the native engine or in the Presidio registry, never in both."""
+    pipeline = build_pipeline({"STREET", "PERSON"})
+    assert set(pipeline.native.entities) == ALL_ENTITIES - {"STREET", "PERSON"}
+    hosted = [
+        entity
+        for recognizer in pipeline.analyzer.registry.get_recognizers(language="de", all_fields=True)
+        for entity in recognizer.supported_entities
+        if type(recognizer).__name__ in ("PatternRecognizer", "GazetteerRecognizer")
+    ]
+    assert sorted(hosted) == ["PERSON", "STREET"]
+
+def test_triage_parity_and_counters():
+    """Triage returns the same spans as running every detector and skips NLP for trivial strings."""
+    analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["de"])
+    triaged = DetectionPipeline(analyzer, CUSTOM_DETECTORS)
+    full = DetectionPipeline(analyzer, CUSTOM_DETECTORS, triage=False)
+    for text in TEST_TEXTS + ["male", "DE", "2", "home", "12345", "+49 170 1234567"]:
+        assert spans(triaged.analyze(text)) == spans(full.analyze(text)), text
+    assert spans(triaged.analyze_batch(TEST_TEXTS)[0]) == spans(full.analyze(TEST_TEXTS[0]))
+
+    counters = TriageCounters()
+    DetectionPipeline(analyzer, CUSTOM_DETECTORS, counters=counters).analyze_batch(["male", "DE", "2", "home"])
+    stats = counters.stats()
+    assert stats["NLP"] == {"runs": 0, "skipped": 4}
+    assert stats["PHONE_NUMBER"] == stats["DATE"] == {"runs": 0, "skipped": 4}
+    assert stats["PERSON"] == {"runs": 1, "skipped": 3}
+
+if __name__ == "__main__":
+    test_pipeline_parity()
+    test_each_detector_hosted_once()
+    test_triage_parity_and_counters()
+    print("\n=== Test Complete ===")
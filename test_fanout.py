@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import pytest
+from fastapi import HTTPException
+from app import routes
+from app.fanout import RETRY_AFTER_SECONDS, InflightBudget, fan_out
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_order_kept_under_concurrency():
+    """Results follow the input order although calls finish out of order, within the concurrency limit."""
+    running = {"now": 0, "max": 0}
+
+    async def work(item):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep((10 - item) / 1000)
+        running["now"] -= 1
+        return item * 2
+
+    budget = InflightBudget(64)
+    assert asyncio.run(fan_out(list(range(10)), work, concurrency=3, budget=budget)) == [i * 2 for i in range(10)]
+    assert running["max"] == 3 and budget.in_use == 0
+
+def test_exhausted_budget_returns_429():
+    """A document that finds no free slots is rejected with 429 and Retry-After; slots are released after errors."""
+    budget = InflightBudget(4)
+    budget.acquire(4)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(fan_out(["a"], lambda item: asyncio.sleep(0), budget=budget))
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == str(RETRY_AFTER_SECONDS)
+    budget.release(4)
+
+    async def fail(item):
+        raise HTTPException(status_code=502)
+
+    with pytest.raises(HTTPException):
+        asyncio.run(fan_out(["a", "b"], fail, budget=budget))
+    assert budget.in_use == 0
+
+def test_fallback_to_single_requests_is_remembered(gateway_service):
+    """Without /anonymize/batch (404) texts go one by one; the missing endpoint is only probed once."""
+    def old_service(path, payload):
+        if path == "/anonymize":
+            return {"anonymized_text": f"[{payload['text']}]"}
+        return 404, {"detail": "Not Found"}
+
+    calls = gateway_service(old_service)
+    assert asyncio.run(routes.anonymize_texts_via_api(["Eva", "Anna", "Eva"], "s1")) == ["[Eva]", "[Anna]", "[Eva]"]
+    assert asyncio.run(routes.anonymize_texts_via_api(["Tom"], "s1")) == ["[Tom]"]
+    paths = [path for path, _ in calls]
+    assert paths.count("/anonymize/batch") == 1 and paths.count("/anonymize") == 3
+    assert routes.batch_endpoints == {"/anonymize/batch": False}
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from app import routes
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def fake_service(path, payload):
+    """Batch endpoints of a service that wraps every text in brackets."""
+    if path == "/anonymize/batch":
+        return {"anonymized_texts": [f"[{text}]" for text in payload["texts"]]}
+    if path == "/deanonymize/batch":
+        return {"deanonymized_texts": [text.replace("anno_", "") for text in payload["texts"]]}
+    return 404, {"detail": "Not Found"}
+
+def test_split_batches_limits(monkeypatch):
+    """Batches respect the item and character limits; an oversized item gets a batch of its own."""
+    monkeypatch.setattr(routes, "BATCH_MAX_ITEMS", 3)
+    monkeypatch.setattr(routes, "BATCH_MAX_CHARS", 10)
+    assert routes.split_batches(["a", "b", "c", "d"]) == [["a", "b", "c"], ["d"]]
+    assert routes.split_batches(["aaaa", "bbbb", "cccc"]) == [["aaaa", "bbbb"], ["cccc"]]
+    assert routes.split_batches(["a", "x" * 25, "b"]) == [["a"], ["x" * 25], ["b"]]
+    assert routes.split_batches([("aaaaaa", "PERSON"), ("bbbbbb", "PERSON")], size=lambda value: len(value[0])) == [
+        [("aaaaaa", "PERSON")], [("bbbbbb", "PERSON")]
+    ]
+    assert routes.split_batches([]) == []
+
+def test_json_leaves_round_trip():
+    """Non-empty strings are collected with their paths and written back in place; other values are left alone."""
+    data = {"name": [{"given": ["Eva", ""], "family": "Schmidt"}], "age": 41, "active": True, "note": None}
+    leaves = routes.collect_json_leaves(data)
+    assert leaves == [(("name", 0, "given", 0), "Eva"), (("name", 0, "family"), "Schmidt")]
+    for path, value in leaves:
+        routes.set_json_leaf(data, path, value.upper())
+    assert data == {"name": [{"given": ["EVA", ""], "family": "SCHMIDT"}], "age": 41, "active": True, "note": None}
+
+def test_texts_are_deduplicated_and_batched(gateway_service, monkeypatch):
+    """Repeated values are sent once, in limited batches; results keep order and surrounding whitespace."""
+    monkeypatch.setattr(routes, "BATCH_MAX_ITEMS", 2)
+    calls = gateway_service(fake_service)
+    texts = ["Eva", "  Eva\n", "Anna", "", "   ", "Eva", "Tom"]
+    result = asyncio.run(routes.anonymize_texts_via_api(texts, "s1"))
+    assert result == ["[Eva]", "  [Eva]\n", "[Anna]", "", "   ", "[Eva]", "[Tom]"]
+    assert calls == [
+        ("/anonymize/batch", {"session_id": "s1", "texts": ["Eva", "Anna"]}),
+        ("/anonymize/batch", {"session_id": "s1", "texts": ["Tom"]}),
+    ]
+
+def test_deanonymize_json_writes_back(gateway_service):
+    """All string leaves are restored with one request; only texts containing tokens are sent."""
+    calls = gateway_service(fake_service)
+    data = {"patient": {"name": "anno_eva", "city": "Berlin"}, "notes": ["anno_eva war hier", 7]}
+    result = asyncio.run(routes.process_deanonymize_json(data, "s1"))
+    assert result == {"patient": {"name": "eva", "city": "Berlin"}, "notes": ["eva war hier", 7]}
+    assert calls == [("/deanonymize/batch", {"session_id": "s1", "texts": ["anno_eva", "anno_eva war hier"]})]
@@ -0,0 +1,63 @@
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+client = TestClient(app)
+
+def service(anonymize_status=200):
+    """Service that opens session s1 and wraps anonymized texts in brackets (or answers with an error)."""
+    def handler(path, payload):
+        if path == "/sessions":
+            return {"session_id": "s1"}
+        if anonymize_status != 200:
+            return anonymize_status, {"detail": "unavailable"}
+        if path == "/anonymize":
+            return {"anonymized_text": f"[{payload['text']}]"}
+        if path == "/anonymize/batch":
+            return {"anonymized_texts": [f"[{text}]" for text in payload["texts"]]}
+        return 404, {"detail": "Not Found"}
+    return handler
+
+@pytest.mark.parametrize("name, content", [
+    ("notes.txt", b"Mein Name ist Eva."),
+    ("patient.json", b'{"name": "Eva"}'),
+    ("patient.xml", b"<patient><name>Eva</name></patient>"),
+])
+def test_service_error_is_returned_as_status(gateway_service, name, content):
+    """A failing first service call yields the service status, not 200 with an aborted body."""
+    gateway_service(service(503))
+    response = client.post("/upload", files={"file": (name, content)})
+    assert response.status_code == 503
+
+def test_text_upload_streams_session_line_first(gateway_service):
+    """The TXT download starts with the session line, followed by the anonymized text."""
+    gateway_service(service())
+    response = client.post("/upload", files={"file": ("notes.txt", b"Mein Name ist Eva.\n")})
+    assert response.status_code == 200
+    assert response.text == "SessionID: s1\n[Mein Name ist Eva.]\n"
+    response = client.post("/upload", files={"file": ("empty.txt", b"")})
+    assert response.text == "SessionID: s1\n"
+
+@pytest.mark.parametrize("endpoint", ["/upload", "/upload-deanonymize"])
+def test_unsupported_format_opens_no_session(gateway_service, endpoint):
+    """An unsupported file is rejected with 415 before any request reaches the service."""
+    calls = gateway_service(service())
+    response = client.post(endpoint, files={"file": ("scan.pdf", b"%PDF-1.4")})
+    assert response.status_code == 415 and calls == []
+
+@pytest.mark.parametrize("name, content", [
+    ("patient.json", b'{"name": '),
+    ("patient.json", b'["no", "session"]'),
+    ("patient.xml", b"<patient><name>Eva</patient>"),
+    ("notes.txt", b"\xff\xfe"),
+])
+def test_malformed_deanonymize_upload_is_client_error(gateway_service, name, content):
+    """Malformed or session-less files are rejected with 400 without calling the service."""
+    calls = gateway_service(service())
+    response = client.post("/upload-deanonymize", files={"file": (name, content)})
+    assert response.status_code == 400 and calls == []
@@ -0,0 +1,56 @@
+import re
+import logging
+from anonymization.app.anonymizer import GERMAN_NAMES, detect_names
+from anonymization.app.gazetteer import Gazetteer
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def regex_name_spans(names, text):
+    """Reference implementation: one regex scan per name (previous detect_names)."""
+    spans = set()
+    for name in names:
+        for match in re.finditer(r'\b' + re.escape(name) + r'\b', text):
+            spans.add((match.start(), match.end()))
+    return spans
+
+def test_gazetteer_matches_regex_scan():
+    """The gazetteer must return exactly the spans of the per-name regex scan."""
+    test_texts = [
+        "Mein Name ist Eva und ich wohne in Hamburg.",
+        "Emma und Thomas sind meine Freunde.",
+        "Elisabeth ist nicht Elisa, und Jana ist nicht Jan.",
+        "Jürgen,Uwe;Dieter(Klaus) und Hans-Peter",
+        "Evas Auto, _Eva_, Eva2 und EVA werden nicht erkannt.",
+        "Eva",
+        "",
+        "Maria Anna Sophie Laura Lena",
+    ]
+    gazetteer = Gazetteer(GERMAN_NAMES)
+    for text in test_texts:
+        expected = regex_name_spans(GERMAN_NAMES, text)
+        found = set(gazetteer.finditer(text))
+        assert found == expected, f"{text}: {found} != {expected}"
+        logger.info(f"✓ {text}: {sorted(found)}")
+
+def test_multi_word_and_overlapping_phrases():
+    """Phrases sharing a prefix are all reported, each on word boundaries."""
+    phrases = ["Hans", "Hans Peter", "Peter", "van der Berg"]
+    text = "Hans Peter van der Berg und Hanspeter"
+    gazetteer = Gazetteer(phrases)
+    assert set(gazetteer.finditer(text)) == regex_name_spans(phrases, text)
+    assert len(gazetteer) == len(phrases)
+
+def test_detect_names():
+    """detect_names returns PERSON results for every dictionary hit."""
+    text = "Elena und Michael arbeiten zusammen in Stuttgart."
+    results = detect_names(text)
+    assert sorted(text[r.start:r.end] for r in results) == ["Elena", "Michael"]
+    assert all(r.entity_type == "PERSON" and r.score == 0.95 for r in results)
+
+if __name__ == "__main__":
+    test_gazetteer_matches_regex_scan()
+    test_multi_word_and_overlapping_phrases()
+    test_detect_names()
+    print("\n=== Test Complete ===")
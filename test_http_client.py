@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import httpx
+import pytest
+from fastapi import HTTPException
+from app import http_client, routes
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def raise_error(error):
+    def handler(path, payload):
+        raise error
+    return handler
+
+@pytest.mark.parametrize("error, status", [
+    (httpx.ReadTimeout("timed out"), 504),
+    (httpx.PoolTimeout("no free connection"), 504),
+    (httpx.ConnectError("connection refused"), 502),
+    (httpx.RemoteProtocolError("server disconnected"), 502),
+])
+def test_transport_errors_map_to_gateway_status(gateway_service, error, status):
+    """Timeouts reach the client as 504 and connection failures as 502."""
+    gateway_service(raise_error(error))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(routes.post_to_service("/anonymize", {"text": "Eva"}))
+    assert excinfo.value.status_code == status
+
+def test_service_status_is_passed_through(gateway_service):
+    """A non-200 answer of the service keeps its status code; a 200 answer returns the JSON body."""
+    gateway_service(lambda path, payload: (503, {"detail": "busy"}) if payload["text"] == "busy" else {"ok": path})
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(routes.post_to_service("/anonymize", {"text": "busy"}))
+    assert excinfo.value.status_code == 503
+    assert asyncio.run(routes.post_to_service("/anonymize", {"text": "Eva"})) == {"ok": "/anonymize"}
+
+def test_shared_client_lifecycle(monkeypatch):
+    """One client is shared until closed; the configured limits and timeouts are applied."""
+    monkeypatch.setattr(http_client, "_client", None)
+    asyncio.run(http_client.start_client())
+    client = http_client.get_client()
+    assert http_client.get_client() is client
+    assert client.timeout.connect == http_client.HTTP_CONNECT_TIMEOUT
+    assert client.timeout.read == http_client.HTTP_TIMEOUT
+    asyncio.run(http_client.close_client())
+    assert client.is_closed and http_client._client is None
@@ -0,0 +1,95 @@
+import json
+import asyncio
+import logging
+from decimal import Decimal
+import ijson
+from app import json_stream
+from app.json_stream import stream_json
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+class AsyncBytes:
+    """In-memory file with the async read() ijson expects."""
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+    async def read(self, size=-1):
+        size = len(self.data) if size < 0 else size
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+def run(document, max_items=500, max_chars=200000, root_member=None, classify=None, raw=None):
+    """Streams the document through stream_json with an upper-casing transform; returns (chunks, batches)."""
+    batches = []
+
+    async def transform(values):
+        batches.append(values)
+        return [value.upper() for value, _ in values]
+
+    async def collect():
+        data = raw if raw is not None else json.dumps(document).encode("utf-8")
+        events = ijson.basic_parse_async(AsyncBytes(data))
+        return [chunk async for chunk in stream_json(events, transform, max_items, max_chars, root_member, classify)]
+
+    return asyncio.run(collect()), batches
+
+def upper(value):
+    if isinstance(value, dict):
+        return {key: upper(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [upper(item) for item in value]
+    return value.upper() if isinstance(value, str) else value
+
+def test_output_equals_json_dumps():
+    """Nested, empty and scalar values are written exactly like json.dumps(indent=2); keys are left alone."""
+    document = {
+        "resourceType": "Patient",
+        "name": [{"given": ["Eva", "Maria"], "family": "Schmidt"}],
+        "empty_map": {}, "empty_list": [], "nested_empty": [{}, []],
+        "age": 41, "weight": 61.5, "big": 12345678901234567890, "active": True, "deceased": False,
+        "note": None, "blank": "", "umlaut": "Müller ⟨1⟩",
+    }
+    chunks, _ = run(document)
+    assert b"".join(chunks).decode("utf-8") == json.dumps(upper(document), ensure_ascii=False, indent=2)
+
+def test_top_level_array_and_scalars():
+    """Top-level arrays and scalars are supported; root_member only applies to a top-level object."""
+    for document in [["Eva", {"a": "Anna"}, [], 1], [], "Eva", 7, None]:
+        chunks, _ = run(document, root_member=("session_id", "s1"))
+        assert b"".join(chunks).decode("utf-8") == json.dumps(upper(document), ensure_ascii=False, indent=2)
+
+def test_numbers_keep_their_spelling():
+    """Decimal numbers keep the spelling of the input (1.10 stays 1.10)."""
+    chunks, _ = run(None, raw=b'{"dose": 1.10, "exp": 1e3, "neg": -0.5}')
+    assert json.loads(b"".join(chunks), parse_float=Decimal) == {"dose": Decimal("1.10"), "exp": Decimal("1E+3"), "neg": Decimal("-0.5")}
+    assert b'"dose": 1.10' in b"".join(chunks)
+
+def test_root_member_replaces_existing_key():
+    """session_id is inserted as the first member; a session_id already in the document is dropped with its value."""
+    document = {"name": "Eva", "session_id": {"old": ["x", {"y": "z"}]}, "city": "Berlin"}
+    chunks, _ = run(document, root_member=("session_id", "s1"))
+    output = b"".join(chunks).decode("utf-8")
+    assert output == json.dumps({"session_id": "s1", "name": "EVA", "city": "BERLIN"}, indent=2)
+    chunks, _ = run({}, root_member=("session_id", "s1"))
+    assert json.loads(b"".join(chunks)) == {"session_id": "s1"}
+
+def test_batch_boundaries():
+    """Values are transformed in batches limited by count and characters, without changing the output."""
+    document = {"texts": [f"text {i}" for i in range(25)], "tail": "x" * 30}
+    chunks, batches = run(document, max_items=4, max_chars=20)
+    assert b"".join(chunks).decode("utf-8") == json.dumps(upper(document), indent=2)
+    assert all(len(batch) <= 4 for batch in batches)
+    assert all(sum(len(value) for value, _ in batch[:-1]) < 20 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 26
+
+def test_chunk_size_is_bounded(monkeypatch):
+    """One pending value followed by many written values does not keep the whole document in memory."""
+    monkeypatch.setattr(json_stream, "FLUSH_CHARS", 4096)
+    document = {"s": "Eva", "n": list(range(300000))}
+    chunks, batches = run(document)
+    assert max(len(chunk) for chunk in chunks) < 4096 + 100
+    assert b"".join(chunks).decode("utf-8") == json.dumps(upper(document), indent=2)
+    assert batches[0] == [("Eva", None)]
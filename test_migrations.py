@@ -0,0 +1,96 @@
+import uuid
+import logging
+import psycopg2
+import pytest
+from anonymization.app.db import run_migrations
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_migrations_are_idempotent(db_conn):
+    """The first run applies every migration, the second run applies nothing."""
+    applied = run_migrations(db_conn)
+    assert applied and applied == sorted(applied)
+    assert run_migrations(db_conn) == []
+
+def test_mapping_table_schema(db_conn):
+    """anonymization has created_at and rejects a second row for the same (session_id, anon_id, created_at)."""
+    run_migrations(db_conn)
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'anonymization'"
+        )
+        columns = {row[0] for row in cursor.fetchall()}
+        assert {"session_id", "anon_id", "original_value", "entity_type", "created_at"} <= columns
+        session_id = str(uuid.uuid4())
+        cursor.execute(
+            "INSERT INTO anonymization (session_id, anon_id, original_value, entity_type, created_at) "
+            "VALUES (%s, %s, %s, %s, '2020-01-01')",
+            (session_id, "anno_00000001", "Eva", "PERSON")
+        )
+        with pytest.raises(psycopg2.errors.UniqueViolation):
+            cursor.execute(
+                "INSERT INTO anonymization (session_id, anon_id, original_value, entity_type, created_at) "
+                "VALUES (%s, %s, %s, %s, '2020-01-01')",
+                (session_id, "anno_00000001", "Anna", "PERSON")
+            )
+
+def test_upgrades_manually_created_table(db_conn):
+    """A pre-existing table without created_at and key is brought up to date."""
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE anonymization (session_id UUID, anon_id TEXT, original_value TEXT, entity_type TEXT)"
+        )
+    db_conn.commit()
+    run_migrations(db_conn)
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint WHERE conrelid = 'anonymization'::regclass AND contype = 'p'"
+        )
+        assert cursor.fetchone()[0] == 1
+
+def test_legacy_duplicates_keep_their_tokens(db_conn):
+    """Repeated values of one legacy session survive the per-session unique index and stay readable."""
+    session_id = str(uuid.uuid4())
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE anonymization (session_id UUID, anon_id TEXT, original_value TEXT, entity_type TEXT)"
+        )
+        cursor.execute(
+            "INSERT INTO anonymization VALUES (%s, 'anno_00000001', 'Eva', 'PERSON'), (%s, 'anno_00000002', 'Eva', 'PERSON')",
+            (session_id, session_id)
+        )
+    db_conn.commit()
+    run_migrations(db_conn)
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT anon_id FROM anonymization WHERE session_id = %s "
+            "AND created_at >= (SELECT opened_at FROM sessions WHERE session_id = %s) ORDER BY anon_id",
+            (session_id, session_id)
+        )
+        assert [row[0] for row in cursor.fetchall()] == ["anno_00000001", "anno_00000002"]
+
+def test_upgrades_table_with_custom_key_and_column_types(db_conn):
+    """A hand-made table with a differently named key and TEXT/TIMESTAMP columns is partitioned without losing rows."""
+    session_id = str(uuid.uuid4())
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE anonymization (session_id TEXT, anon_id VARCHAR(32), original_value TEXT, entity_type TEXT, "
+            "created_at TIMESTAMP NOT NULL DEFAULT now(), CONSTRAINT mappings_pk PRIMARY KEY (session_id, anon_id))"
+        )
+        cursor.execute(
+            "INSERT INTO anonymization VALUES (%s, 'anno_00000001', 'Eva', 'PERSON', now() - interval '1 day')",
+            (session_id,)
+        )
+    db_conn.commit()
+    run_migrations(db_conn)
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT original_value FROM anonymization WHERE session_id = %s", (session_id,))
+        assert cursor.fetchall() == [("Eva",)]
+        cursor.execute(
+            "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'anonymization_legacy'::regclass AND attname IN ('session_id', 'created_at')"
+        )
+        assert dict(cursor.fetchall()) == {"session_id": "uuid", "created_at": "timestamp with time zone"}
@@ -0,0 +1,48 @@
+import uuid
+import logging
+from anonymization.app.anonymizer import AnonymizationService
+from anonymization.app.normalization import normalize_streets
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_view_and_offsets():
+    """The normalized view expands and splits street names; spans of the view map back onto the original."""
+    text = "Eva, Hauptstraße 123 und Haupt Str. 5, Werner-von-Siemens-Straße 7."
+    normalized = normalize_streets(text)
+    assert normalized.text == "Eva, Haupt straße 123 und Haupt Straße 5, Werner von Siemens Straße 7."
+    view = normalized.text
+    for fragment, original in [
+        ("Haupt straße 123", "Hauptstraße 123"),
+        ("straße 123", "straße 123"),
+        ("Haupt Straße 5", "Haupt Str. 5"),
+        ("Werner von Siemens Straße 7", "Werner-von-Siemens-Straße 7"),
+        ("Eva", "Eva"),
+    ]:
+        start = view.index(fragment)
+        mapped_start, mapped_end = normalized.original_span(start, start + len(fragment))
+        assert text[mapped_start:mapped_end] == original
+
+def test_text_without_streets_is_untouched():
+    """Text without street names is returned as is, including surrounding whitespace."""
+    normalized = normalize_streets("  Mein Name ist Eva.  ")
+    assert normalized.text == normalized.original == "  Mein Name ist Eva.  "
+    assert normalized.original_span(2, 6) == (2, 6)
+
+def test_round_trip_keeps_original_text(monkeypatch, local_tokens):
+    """Only detected values are replaced; deanonymizing restores the original spelling (e.g. Hauptstraße)."""
+    stored = {}
+    monkeypatch.setattr(
+        AnonymizationService, "save_mappings",
+        lambda self, session_id, entity_mapping: stored.update(entity_mapping) or dict(entity_mapping)
+    )
+    service = AnonymizationService()
+    service.allocator = local_tokens
+    text = "Mein Name ist Elisa, ich wohne in Hauptstraße 123, 10115 Berlin.  "
+    anonymized = service.anonymize_text(str(uuid.uuid4()), text)
+    assert "Haupt straße" not in anonymized and anonymized.endswith(".  ")
+    assert ("Hauptstraße 123", "STREET") in stored
+    for (value, _), token in stored.items():
+        anonymized = anonymized.replace(token, value)
+    assert anonymized == text
@@ -0,0 +1,85 @@
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from anonymization.app.db import run_migrations
+from anonymization.app.partitions import ensure_partitions, list_partitions, purge_expired_partitions, purge_expired_sessions
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def partition_of_row(conn, session_id):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT tableoid::regclass::text FROM anonymization WHERE session_id = %s", (session_id,))
+        return cursor.fetchone()[0]
+
+def insert_row(conn, created_at):
+    session_id = str(uuid.uuid4())
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO anonymization (session_id, anon_id, original_value, entity_type, created_at) "
+            "VALUES (%s, 'anno_00000001', 'Eva', 'PERSON', %s)",
+            (session_id, created_at)
+        )
+    conn.commit()
+    return session_id
+
+def test_existing_rows_become_legacy_partition(db_conn):
+    """Rows written before partitioning stay readable in the legacy partition."""
+    run_migrations(db_conn)
+    session_id = insert_row(db_conn, datetime.now(timezone.utc))
+    assert partition_of_row(db_conn, session_id) == "anonymization_legacy"
+    names = [p["name"] for p in list_partitions(db_conn)]
+    assert names == ["anonymization_legacy", "anonymization_default"]
+
+def test_ensure_partitions_creates_daily_partitions(db_conn):
+    """Daily partitions continue after the last range and are created only once."""
+    run_migrations(db_conn)
+    created = ensure_partitions(db_conn, days_ahead=3)
+    assert len(created) == 3
+    assert ensure_partitions(db_conn, days_ahead=3) == []
+    day_after_tomorrow = datetime.now(timezone.utc) + timedelta(days=2)
+    session_id = insert_row(db_conn, day_after_tomorrow)
+    assert partition_of_row(db_conn, session_id) == f"anonymization_p{day_after_tomorrow:%Y%m%d}"
+    sizes = {p["name"]: p["size_bytes"] for p in list_partitions(db_conn)}
+    assert all(size >= 0 for size in sizes.values())
+
+def test_purge_drops_whole_expired_partitions(db_conn):
+    """Partitions ending before the TTL cutoff are dropped; the default partition is kept."""
+    run_migrations(db_conn)
+    ensure_partitions(db_conn, days_ahead=5)
+    now = datetime.now(timezone.utc)
+    assert purge_expired_partitions(db_conn, retention_days=0) == []
+    dropped = purge_expired_partitions(db_conn, retention_days=3, now=now + timedelta(days=6))
+    remaining = [p["name"] for p in list_partitions(db_conn)]
+    assert "anonymization_legacy" in dropped
+    assert "anonymization_default" in remaining
+    assert f"anonymization_p{now + timedelta(days=5):%Y%m%d}" in remaining
+    assert not set(dropped) & set(remaining)
+
+def test_rows_in_default_partition_move_to_new_partition(db_conn):
+    """Rows written to the default partition before their day existed move into it when it is created."""
+    run_migrations(db_conn)
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    session_id = insert_row(db_conn, tomorrow)
+    assert partition_of_row(db_conn, session_id) == "anonymization_default"
+    assert f"anonymization_p{tomorrow:%Y%m%d}" in ensure_partitions(db_conn, days_ahead=2)
+    assert partition_of_row(db_conn, session_id) == f"anonymization_p{tomorrow:%Y%m%d}"
+    names = [p["name"] for p in list_partitions(db_conn)]
+    assert names[-1] == "anonymization_default" and len(names) == 4
+
+def test_expired_sessions_are_deleted_in_batches(db_conn):
+    """Expired sessions are removed in several small transactions; newer sessions stay."""
+    run_migrations(db_conn)
+    now = datetime.now(timezone.utc)
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO sessions (session_id, opened_at) "
+            "SELECT gen_random_uuid(), %s FROM generate_series(1, 25)", (now - timedelta(days=10),)
+        )
+        cursor.execute("INSERT INTO sessions (session_id, opened_at) VALUES (gen_random_uuid(), %s)", (now,))
+    db_conn.commit()
+    assert purge_expired_sessions(db_conn, now - timedelta(days=1), batch_size=10) == 25
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sessions")
+        assert cursor.fetchone()[0] == 1
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import xml.etree.ElementTree as ET
+import ijson
+from fastapi.testclient import TestClient
+from app import routes
+from app.json_stream import stream_json
+from app.main import app
+from app.path_rules import SKIP, PathRules, load_path_rules
+from app.xml_stream import stream_xml
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+client = TestClient(app)
+
+class AsyncBytes:
+    """In-memory file with the async read() ijson expects."""
+    def __init__(self, data: bytes):
+        self.data = data
+    async def read(self, size=-1):
+        chunk, self.data = self.data[:size if size >= 0 else None], self.data[size if size >= 0 else len(self.data):]
+        return chunk
+
+FHIR = {
+    "resourceType": "Patient",
+    "id": "12345678",
+    "managingOrganization": {"reference": "Patient/12345678"},
+    "gender": "female",
+    "name": [{"family": "Schmidt", "given": ["Eva"]}],
+    "telecom": [{"system": "phone", "value": "030 1234567"}],
+    "text": "Eva wohnt in Berlin.",
+}
+
+CDA = (
+    '<ClinicalDocument xmlns="urn:hl7-org:v3"><patientRole>'
+    '<telecom use="HP" value="tel:+49301234567"/>'
+    '<code code="10164-2" displayName="History"/>'
+    '<patient><name><given>Eva</given></name></patient>'
+    '<text>Eva wohnt in Berlin.</text>'
+    '</patientRole></ClinicalDocument>'
+)
+
+def service(entities=True):
+    """Service that marks texts sent for detection with [..] and typed values with <type:..>."""
+    def handler(path, payload):
+        if path == "/sessions":
+            return {"session_id": "s1"}
+        if path == "/anonymize/batch":
+            return {"anonymized_texts": [f"[{text}]" for text in payload["texts"]]}
+        if path == "/anonymize/entities" and entities:
+            return {"anonymized_texts": [f"<{e['entity_type']}:{e['text']}>" for e in payload["entities"]]}
+        return 404, {"detail": "Not Found"}
+    return handler
+
+def test_match_suffix_wildcard_and_precedence():
+    """Rules match path suffixes, '*' matches one segment and the longer rule wins."""
+    rules = PathRules(["code", "meta.*", "coding[].display"], {"name[].family": "PERSON", "valueCodeableConcept.code": "ID"})
+    assert rules.match(("code",)) == SKIP
+    assert rules.match(("contact[]", "name[]", "family")) == "PERSON"
+    assert rules.match(("family",)) is None
+    assert rules.match(("meta", "source")) == SKIP
+    assert rules.match(("meta", "tag[]", "code")) == SKIP
+    assert rules.match(("meta", "tag[]", "display")) is None
+    assert rules.match(("valueCodeableConcept", "code")) == "ID"
+    assert rules.match(("code", "coding[]", "display")) == SKIP
+    assert not PathRules() and load_path_rules()
+
+def test_paths_seen_by_classify():
+    """JSON paths mark array elements with '[]'; XML paths use local element names and '@attribute'."""
+    json_paths, xml_paths = [], []
+
+    async def identity(values):
+        return [value for value, _ in values]
+
+    async def collect_json():
+        data = json.dumps({"name": [{"given": ["Eva"]}], "grid": [["x"]], "id": "1"}).encode("utf-8")
+        events = ijson.basic_parse_async(AsyncBytes(data))
+        return [chunk async for chunk in stream_json(events, identity, 10, 100, classify=lambda p: json_paths.append(p))]
+
+    async def chunks():
+        yield CDA.encode("utf-8")
+
+    async def collect_xml():
+        return [chunk async for chunk in stream_xml(chunks(), identity, 10, 100, classify=lambda p: xml_paths.append(p))]
+
+    asyncio.run(collect_json())
+    asyncio.run(collect_xml())
+    assert json_paths == [("name[]", "given[]"), ("grid[][]",), ("id",)]
+    assert ("ClinicalDocument", "patientRole", "telecom", "@value") in xml_paths
+    assert ("ClinicalDocument", "patientRole", "patient", "name", "given") in xml_paths
+
+def test_fhir_upload_uses_rules(gateway_service):
+    """Structural FHIR values pass through unchanged; names go to /anonymize/entities, telecom values to detection."""
+    calls = gateway_service(service())
+    response = client.post("/upload", files={"file": ("patient.json", json.dumps(FHIR).encode("utf-8"))})
+    result = response.json()
+    assert result["resourceType"] == "Patient" and result["gender"] == "female"
+    assert result["telecom"][0]["system"] == "phone"
+    assert result["name"][0] == {"family": "<PERSON:Schmidt>", "given": ["<PERSON:Eva>"]}
+    assert result["telecom"][0]["value"] == "[030 1234567]"
+    assert result["text"] == "[Eva wohnt in Berlin.]"
+    assert result["id"] == "[12345678]" and result["managingOrganization"]["reference"] == "[Patient/12345678]"
+    sent = {path: payload for path, payload in calls}
+    assert sent["/anonymize/batch"]["texts"] == ["12345678", "Patient/12345678", "030 1234567", "Eva wohnt in Berlin."]
+    assert {"text": "Schmidt", "entity_type": "PERSON"} in sent["/anonymize/entities"]["entities"]
+
+def test_cda_upload_uses_rules(gateway_service):
+    """Structural CDA attributes pass through unchanged; telecom.@value (phone, e-mail or URL) goes to detection."""
+    gateway_service(service())
+    response = client.post("/upload", files={"file": ("patient.xml", CDA.encode("utf-8"))})
+    root = ET.fromstring(response.text)
+    ns = {"v3": "urn:hl7-org:v3"}
+    telecom = root.find(".//v3:telecom", ns)
+    assert telecom.attrib == {"use": "HP", "value": "[tel:+49301234567]"}
+    assert root.find(".//v3:code", ns).attrib == {"code": "10164-2", "displayName": "[History]"}
+    assert root.find(".//v3:given", ns).text == "<PERSON:Eva>"
+    assert root.find(".//v3:text", ns).text == "[Eva wohnt in Berlin.]"
+
+def test_entities_fallback_to_detection(gateway_service):
+    """Without /anonymize/entities typed values go through detection; the missing endpoint is remembered."""
+    calls = gateway_service(service(entities=False))
+    result = asyncio.run(routes.anonymize_values_via_api([("Eva", "PERSON"), ("Berlin", None), ("Eva", "PERSON")], "s1"))
+    assert result == ["[Eva]", "[Berlin]", "[Eva]"]
+    asyncio.run(routes.anonymize_values_via_api([("Tom", "PERSON")], "s1"))
+    assert [path for path, _ in calls].count("/anonymize/entities") == 1
+    assert routes.batch_endpoints["/anonymize/entities"] is False
@@ -0,0 +1,93 @@
+import uuid
+import logging
+import pytest
+from anonymization.app import anonymizer
+from anonymization.app.anonymizer import TOKEN_REGEX, AnonymizationService
+from anonymization.app.db import run_migrations
+from anonymization.app.pseudonyms import KeyedTokens, TokenVault
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+class SingleConnectionPool:
+    """Pool stand-in handing out the test connection."""
+    def __init__(self, conn):
+        self.conn = conn
+    def getconn(self):
+        return self.conn
+    def putconn(self, conn):
+        pass
+
+def test_keyed_tokens_are_deterministic():
+    """The same (tenant, type, value) gives the same token in every instance; any other input changes it."""
+    token = KeyedTokens(b"secret", "clinic-a").token("Eva", "PERSON")
+    assert TOKEN_REGEX.fullmatch(token) and len(token) == len("anno_") + 16
+    assert KeyedTokens(b"secret", "clinic-a").token("Eva", "PERSON") == token
+    assert KeyedTokens(b"secret", "clinic-b").token("Eva", "PERSON") != token
+    assert KeyedTokens(b"other", "clinic-a").token("Eva", "PERSON") != token
+    assert KeyedTokens(b"secret", "clinic-a").token("Eva", "LOCATION") != token
+    with pytest.raises(ValueError):
+        KeyedTokens(b"", "clinic-a")
+
+def test_keyed_tokens_keep_64_bits():
+    """hmac tokens carry at least 64 bits of the digest; shorter tokens are refused."""
+    assert len(KeyedTokens(b"secret", "clinic-a", length=20).token("Eva", "PERSON")) == len("anno_") + 20
+    for length in (8, 15, 65):
+        with pytest.raises(ValueError):
+            KeyedTokens(b"secret", "clinic-a", length=length)
+
+def test_keyed_mode_skips_database(monkeypatch):
+    """In hmac mode anonymization writes nothing and repeated values share a token across sessions."""
+    monkeypatch.setattr(anonymizer, "get_db_connection", lambda: pytest.fail("database used"))
+    service = AnonymizationService()
+    service.keyed_tokens = KeyedTokens(b"secret", "clinic-a")
+    service.vault = None
+    first = service.anonymize_text(str(uuid.uuid4()), "Mein Name ist Eva.")
+    second = service.anonymize_batch(str(uuid.uuid4()), ["Eva wohnt hier."])[0]
+    token = service.keyed_tokens.token("Eva", "PERSON")
+    assert first == f"Mein Name ist {token}." and second.startswith(token)
+    assert service.deanonymize_text(str(uuid.uuid4()), first) == first
+
+def test_hmac_upload_runs_no_queries(monkeypatch):
+    """The calls of a document upload in hmac mode (open session, typed values, detection) open no cursor."""
+    cursors = []
+    class CountingConnection:
+        def cursor(self):
+            cursors.append(1)
+            raise AssertionError("database used")
+        def commit(self):
+            pass
+        def rollback(self):
+            pass
+    monkeypatch.setattr(anonymizer, "get_db_connection", CountingConnection)
+    monkeypatch.setattr(anonymizer, "release_db_connection", lambda conn: None)
+    service = AnonymizationService()
+    service.keyed_tokens = KeyedTokens(b"secret", "clinic-a")
+    service.vault = None
+    session_id = service.open_session()["session_id"]
+    assert str(uuid.UUID(session_id)) == session_id
+    assert service.anonymize_entities(session_id, [("Schmidt", "PERSON")]) == [service.keyed_tokens.token("Schmidt", "PERSON")]
+    assert "Eva" not in service.anonymize_batch(session_id, ["Mein Name ist Eva."])[0]
+    assert cursors == []
+
+def test_vault_round_trip(db_conn):
+    """Buffered mappings are readable at once, written behind in one flush and readable from the table."""
+    run_migrations(db_conn)
+    pool = SingleConnectionPool(db_conn)
+    keyed = KeyedTokens(b"secret", "clinic-a")
+    service = AnonymizationService()
+    service.keyed_tokens = keyed
+    service.vault = TokenVault(pool, "clinic-a")
+    anonymized = service.anonymize_text(str(uuid.uuid4()), "Mein Name ist Eva.")
+    assert service.deanonymize_text(str(uuid.uuid4()), anonymized) == "Mein Name ist Eva."
+    assert service.vault.flush() == 1 and service.vault.stats()["pending"] == 0
+
+    reader = TokenVault(pool, "clinic-a")
+    assert reader.lookup([keyed.token("Eva", "PERSON")]) == {keyed.token("Eva", "PERSON"): "Eva"}
+    assert TokenVault(pool, "clinic-b").lookup([keyed.token("Eva", "PERSON")]) == {}
+
+    reader.add({("Anna", "PERSON"): keyed.token("Eva", "PERSON")})
+    reader.flush()
+    assert reader.stats()["collisions"] == 1
+    assert reader.lookup([keyed.token("Eva", "PERSON")]) == {keyed.token("Eva", "PERSON"): "Eva"}
@@ -0,0 +1,128 @@
+import uuid
+import logging
+import pytest
+from psycopg2 import extensions
+from datetime import datetime, timedelta, timezone
+from anonymization.app import anonymizer
+from anonymization.app.anonymizer import AnonymizationService
+from anonymization.app.db import run_migrations
+from anonymization.app.partitions import ensure_partitions, purge_expired_partitions
+from anonymization.app.sessions import SessionRegistry, parse_session_id
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_parse_session_id():
+    """Client session ids are accepted in canonical UUID form; anything else is rejected."""
+    session_id = str(uuid.uuid4())
+    assert parse_session_id(session_id.upper()) == session_id
+    for invalid in ["", "abc", "1; DROP TABLE sessions", 42, None]:
+        with pytest.raises(ValueError):
+            parse_session_id(invalid)
+
+def test_open_session_is_idempotent(db_conn):
+    """Opening a known session returns its original opened_at, from the database and from the cache."""
+    run_migrations(db_conn)
+    session_id = str(uuid.uuid4())
+    _, opened_at = SessionRegistry().open(db_conn, session_id)
+    assert SessionRegistry().open(db_conn, session_id) == (session_id, opened_at)
+    new_session_id, _ = SessionRegistry().open(db_conn)
+    assert parse_session_id(new_session_id) == new_session_id
+
+def test_session_round_trip_uses_client_session(db_conn, monkeypatch):
+    """A document anonymized under a client session is restored with one mapping query for all texts."""
+    run_migrations(db_conn)
+    ensure_partitions(db_conn, days_ahead=1)
+    monkeypatch.setattr(anonymizer, "get_db_connection", lambda: db_conn)
+    monkeypatch.setattr(anonymizer, "release_db_connection", lambda conn: conn.rollback())
+    monkeypatch.setattr(anonymizer, "session_registry", SessionRegistry())
+    service = AnonymizationService()
+    service.sessions = anonymizer.session_registry
+    session_id = service.open_session()["session_id"]
+    texts = ["Mein Name ist Eva.", "Tel +49 170 1234567", "ohne Daten"]
+    anonymized = service.anonymize_batch(session_id, texts)
+    assert anonymized[0] != texts[0] and anonymized[2] == texts[2]
+
+    with db_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT a.created_at = s.opened_at FROM anonymization a JOIN sessions s USING (session_id) "
+            "WHERE session_id = %s", (session_id,)
+        )
+        assert cursor.fetchall() == [(True,)]
+    db_conn.rollback()
+
+    queries = []
+    class CountingCursor(extensions.cursor):
+        def execute(self, query, params=None):
+            queries.append(query)
+            return super().execute(query, params)
+    db_conn.cursor_factory = CountingCursor
+    assert service.deanonymize_batch(session_id, anonymized) == texts
+    assert len(queries) == 1
+    assert service.deanonymize_batch(str(uuid.uuid4()), anonymized) == anonymized
+
+def test_purge_expires_sessions_with_their_partitions(db_conn):
+    """Sessions opened before the end of the last dropped partition are removed with it."""
+    run_migrations(db_conn)
+    ensure_partitions(db_conn, days_ahead=3)
+    session_id, _ = SessionRegistry().open(db_conn)
+    now = datetime.now(timezone.utc)
+    purge_expired_partitions(db_conn, retention_days=1, now=now + timedelta(days=2))
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sessions WHERE session_id = %s", (session_id,))
+        assert cursor.fetchone()[0] == 0
+
+def test_repeated_values_reuse_session_tokens(db_conn, monkeypatch):
+    """A repeated value keeps its token and row; known values skip the database, other processes reuse the row."""
+    run_migrations(db_conn)
+    ensure_partitions(db_conn, days_ahead=1)
+    checkouts = []
+    monkeypatch.setattr(anonymizer, "get_db_connection", lambda: checkouts.append(1) or db_conn)
+    monkeypatch.setattr(anonymizer, "release_db_connection", lambda conn: conn.rollback())
+    service = AnonymizationService()
+    service.sessions = SessionRegistry()
+    session_id = str(uuid.uuid4())
+
+    first = service.anonymize_text(session_id, "Mein Name ist Eva.")
+    checkouts.clear()
+    second = service.anonymize_text(session_id, "Eva ist Ärztin.")
+    assert first.split()[-1].rstrip(".") == second.split()[0]
+    assert checkouts == []
+
+    other_process = AnonymizationService()
+    other_process.sessions = SessionRegistry()
+    assert other_process.anonymize_text(session_id, "Eva ist Ärztin.") == second
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM anonymization WHERE session_id = %s", (session_id,))
+        assert cursor.fetchone()[0] == 1
+
+def test_session_row_commits_with_mappings(db_conn, monkeypatch, local_tokens):
+    """The first write of a session commits its session row and mappings together; a failed write keeps neither."""
+    run_migrations(db_conn)
+    ensure_partitions(db_conn, days_ahead=1)
+    commits = []
+    class CommitCounter:
+        def cursor(self):
+            return db_conn.cursor()
+        def commit(self):
+            commits.append(1)
+            db_conn.commit()
+        def rollback(self):
+            db_conn.rollback()
+    monkeypatch.setattr(anonymizer, "get_db_connection", CommitCounter)
+    monkeypatch.setattr(anonymizer, "release_db_connection", lambda conn: conn.rollback())
+    service = AnonymizationService()
+    service.sessions = SessionRegistry()
+    service.allocator = local_tokens
+    session_id = str(uuid.uuid4())
+    service.anonymize_text(session_id, "Mein Name ist Eva.")
+    assert len(commits) == 1
+
+    failed_session_id = str(uuid.uuid4())
+    with pytest.raises(ValueError):
+        service.save_mappings(failed_session_id, {("Eva\x00", "PERSON"): "anno_g0000000"})
+    assert failed_session_id not in service.sessions._sessions
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT session_id::text FROM sessions WHERE session_id IN (%s, %s)", (session_id, failed_session_id))
+        assert cursor.fetchall() == [(session_id,)]
@@ -0,0 +1,47 @@
+import uuid
+import logging
+import pytest
+from anonymization.app.anonymizer import AnonymizationService
+from anonymization.app.span_cache import ENTRY_OVERHEAD_BYTES, SPAN_BYTES, SpanCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_lru_eviction_by_size():
+    """The least recently used entry is evicted once the estimated size exceeds the limit."""
+    cache = SpanCache(max_bytes=2 * (ENTRY_OVERHEAD_BYTES + SPAN_BYTES), version="v1")
+    cache.put("Eva", [(0, 3, "PERSON")])
+    cache.put("Hamburg", [(0, 7, "LOCATION")])
+    assert cache.get("Eva") == ((0, 3, "PERSON"),)
+    cache.put("Thomas", [(0, 6, "PERSON")])
+    assert cache.get("Hamburg") is None
+    assert cache.get("Eva") is not None and cache.get("Thomas") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (3, 1, 1, 2)
+
+def test_version_and_invalidation():
+    """A new detector configuration version never sees entries of the previous one."""
+    cache = SpanCache(max_bytes=1 << 20, version="v1")
+    cache.put("Eva", [(0, 3, "PERSON")])
+    cache.invalidate("v2")
+    assert cache.get("Eva") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["bytes"] == 0
+
+def test_repeated_text_skips_detection(monkeypatch, local_tokens):
+    """A repeated text reuses cached spans without running detection, and tokens still come from the session."""
+    monkeypatch.setattr(
+        AnonymizationService, "save_mappings",
+        lambda self, session_id, entity_mapping: dict(entity_mapping)
+    )
+    service = AnonymizationService()
+    service.allocator = local_tokens
+    monkeypatch.setattr(service, "span_cache", SpanCache(max_bytes=1 << 20, version="test"))
+    text = "Mein Name ist Eva und ich wohne in Hamburg."
+    first = service.anonymize_text(str(uuid.uuid4()), text)
+
+    monkeypatch.setattr(service.pipeline, "analyze", lambda *args, **kwargs: pytest.fail("detection called"))
+    monkeypatch.setattr(service.pipeline, "analyze_batch", lambda *args, **kwargs: pytest.fail("detection called"))
+    second = service.anonymize_batch(str(uuid.uuid4()), [text, text])
+    assert "Eva" not in second[0] and second[0] == second[1] != first
+    assert service.span_cache.stats()["hits"] == 1
@@ -0,0 +1,92 @@
+import random
+import logging
+from presidio_analyzer import RecognizerResult
+from anonymization.app.spans import resolve_overlaps, rewrite_spans
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_rewrite_spans_replaces_only_detected_offsets():
+    """Only the given offsets are rewritten, other occurrences of the same value stay untouched."""
+    text = "Eva wohnt bei Eva in 10115 Berlin."
+    result = rewrite_spans(text, [(21, 26, "anno_zip"), (0, 3, "anno_eva")])
+    assert result == "anno_eva wohnt bei Eva in anno_zip Berlin."
+
+def test_rewrite_spans_skips_overlaps():
+    """Overlapping spans never rewrite inside an already inserted token; the longer span wins on a tie."""
+    text = "Tel 030-12345678 Ende"
+    replacements = [
+        (4, 16, "anno_phone"),
+        (4, 7, "anno_short"),
+        (8, 16, "anno_inner"),
+    ]
+    assert rewrite_spans(text, replacements) == "Tel anno_phone Ende"
+
+def test_rewrite_spans_edges():
+    """Spans at the text boundaries and an empty span list."""
+    assert rewrite_spans("Eva", [(0, 3, "anno_x")]) == "anno_x"
+    assert rewrite_spans("Eva und Anna", []) == "Eva und Anna"
+    assert rewrite_spans("Eva und Anna", [(0, 3, "A"), (8, 12, "B")]) == "A und B"
+
+def test_resolve_overlaps_prefers_longer_spans():
+    """'am 15' (LICENSE_PLATE) loses against the longer overlapping date, independent spans are kept."""
+    text = "Ich bin am 15. Januar 1910 geboren, Eva."
+    results = [
+        RecognizerResult("LICENSE_PLATE", 8, 13, 1.0),
+        RecognizerResult("DATE", 11, 26, 1.0),
+        RecognizerResult("PERSON", 36, 39, 0.95),
+    ]
+    selected = resolve_overlaps(results)
+    assert [text[r.start:r.end] for r in selected] == ["15. Januar 1910", "Eva"]
+
+def test_resolve_overlaps_score_and_priority():
+    """Equal spans are decided by score, then by the configured entity priority."""
+    text = "Nummer 12345678901 und 10115"
+    results = [
+        RecognizerResult("PHONE_NUMBER", 7, 18, 1.0),
+        RecognizerResult("TAX_ID", 7, 18, 1.0),
+        RecognizerResult("ZIP_CODE", 7, 12, 1.0),
+        RecognizerResult("PHONE_NUMBER", 7, 18, 0.4),
+        RecognizerResult("ZIP_CODE", 23, 28, 1.0),
+        RecognizerResult("LOCATION", 23, 28, 0.85),
+    ]
+    selected = resolve_overlaps(results, ["TAX_ID", "PHONE_NUMBER"])
+    assert [(text[r.start:r.end], r.entity_type) for r in selected] == [("12345678901", "TAX_ID"), ("10115", "ZIP_CODE")]
+    selected = resolve_overlaps(results, ["PHONE_NUMBER", "TAX_ID"])
+    assert [(r.entity_type, r.score) for r in selected] == [("PHONE_NUMBER", 1.0), ("ZIP_CODE", 1.0)]
+
+def test_resolve_overlaps_chain():
+    """Only spans overlapping an accepted winner are dropped; adjacent spans survive."""
+    results = [
+        RecognizerResult("A", 0, 4, 1.0),
+        RecognizerResult("B", 3, 10, 1.0),
+        RecognizerResult("C", 9, 13, 1.0),
+    ]
+    assert [r.entity_type for r in resolve_overlaps(results)] == ["B"]
+    results.append(RecognizerResult("D", 10, 14, 1.0))
+    assert [r.entity_type for r in resolve_overlaps(results)] == ["B", "D"]
+
+def test_resolve_overlaps_matches_greedy_reference():
+    """Random candidates give the same winners as checking each candidate against every accepted span."""
+    rng = random.Random(5)
+    for _ in range(500):
+        results = []
+        for _ in range(rng.randint(0, 30)):
+            start = rng.randint(0, 60)
+            results.append(RecognizerResult(rng.choice("ABC"), start, start + rng.randint(1, 12), rng.choice([0.5, 1.0])))
+        expected = []
+        for res in sorted(results, key=lambda r: (r.start - r.end, -r.score, "BA".find(r.entity_type) % 3, r.start)):
+            if all(res.end <= other.start or other.end <= res.start for other in expected):
+                expected.append(res)
+        assert resolve_overlaps(results, ["B", "A"]) == sorted(expected, key=lambda r: r.start)
+
+if __name__ == "__main__":
+    test_resolve_overlaps_prefers_longer_spans()
+    test_resolve_overlaps_score_and_priority()
+    test_resolve_overlaps_chain()
+    test_resolve_overlaps_matches_greedy_reference()
+    test_rewrite_spans_replaces_only_detected_offsets()
+    test_rewrite_spans_skips_overlaps()
+    test_rewrite_spans_edges()
+    print("\n=== Test Complete ===")
@@ -0,0 +1,50 @@
+import importlib
+import logging
+import pytest
+from anonymization.app.tokens import TokenAllocator, token_regex
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def test_blocks_are_reserved_once():
+    """Tokens are unique, fixed-length and cost one reservation per block of ids."""
+    reserved = []
+    def reserve(count):
+        start = sum(reserved)
+        reserved.append(count)
+        return range(start + 1, start + count + 1)
+    allocator = TokenAllocator(reserve, block_size=100)
+    tokens = allocator.allocate(30) + allocator.allocate(50) + allocator.allocate(150)
+    assert len(set(tokens)) == 230
+    assert reserved == [100, 130]
+    pattern = token_regex("anno_", 8)
+    assert all(pattern.fullmatch(token) and token[5] in "ghijklmnopqrstuvwxyz" for token in tokens)
+
+def test_legacy_tokens_still_match():
+    """Random hex tokens from before the allocator are still recognized, and never equal a new token."""
+    pattern = token_regex("anno_", 8)
+    assert pattern.findall("Eva: anno_3fa9c2e1, Berlin: anno_g0000001.") == ["anno_3fa9c2e1", "anno_g0000001"]
+    assert not pattern.search("xanno_3fa9c2e1 anno_3fa9c2e12")
+    pattern = token_regex("anno_", 8, 16)
+    assert pattern.findall("anno_3fa9c2e1 anno_3fa9c2e1b7d04a55 anno_3fa9c2e1b7") == ["anno_3fa9c2e1", "anno_3fa9c2e1b7d04a55"]
+    allocator = TokenAllocator(lambda count: [0, 36 ** 7 * 20 - 1], length=8)
+    assert allocator.allocate(2) == ["anno_g0000000", "anno_zzzzzzzz"]
+
+def test_exhausted_space_raises():
+    """An id beyond the fixed token length is an error, not a longer token."""
+    allocator = TokenAllocator(lambda count: [36 ** 2 * 20], length=3)
+    with pytest.raises(RuntimeError):
+        allocator.allocate(1)
+
+def test_unknown_token_mode_stops_startup(monkeypatch):
+    """An unknown TOKEN_MODE (including the former "random") fails at import instead of silently using sequence mode."""
+    from anonymization.app import config
+    for mode in ("random", "hmca"):
+        monkeypatch.setenv("TOKEN_MODE", mode)
+        with pytest.raises(ValueError):
+            importlib.reload(config)
+    monkeypatch.setenv("TOKEN_MODE", "HMAC ")
+    assert importlib.reload(config).TOKEN_MODE == "hmac"
+    monkeypatch.delenv("TOKEN_MODE")
+    assert importlib.reload(config).TOKEN_MODE == "sequence"
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from app import routes
+from app.xml_stream import XSI_NS, stream_xml
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+CDA = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ClinicalDocument xmlns="urn:hl7-org:v3" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:sdtc="urn:hl7-org:sdtc">
+  <recordTarget>
+    <patientRole classCode="PAT">
+      <addr use="HP"><streetAddressLine>Hauptstra\xc3\x9fe 5</streetAddressLine><city>Berlin</city></addr>
+      <telecom value="tel:+49301234567"/>
+      <patient>
+        <name><given>Eva</given><family>Schmidt</family></name>
+        <sdtc:deceasedInd value="false"/>
+        <birthTime value="19800115"/>
+      </patient>
+    </patientRole>
+  </recordTarget>
+  <component><section><code xsi:type="CE" code="10164-2"/><text>Eva <content>klagt</content> \xc3\xbcber Kopfschmerzen.</text></section></component>
+</ClinicalDocument>"""
+
+async def chunks_of(data: bytes, size: int = 7):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+def run(data, transform=None, max_items=500, max_chars=200000, first_child=None, classify=None):
+    """Streams the document in small chunks through stream_xml; returns (output, batches)."""
+    batches = []
+
+    async def upper(values):
+        batches.append(values)
+        return [(transform or str.upper)(value) for value, _ in values]
+
+    async def collect():
+        return b"".join([chunk async for chunk in stream_xml(chunks_of(data), upper, max_items, max_chars, first_child, classify)])
+
+    return asyncio.run(collect()).decode("utf-8"), batches
+
+def expected_tree(data, first_child=None):
+    """The document with upper-cased texts, tails and non-xsi attributes (the reference result)."""
+    root = ET.fromstring(data)
+    for elem in root.iter():
+        elem.text = elem.text and elem.text.upper()
+        elem.tail = elem.tail and elem.tail.upper()
+        for name, value in elem.attrib.items():
+            if not name.startswith("{" + XSI_NS + "}"):
+                elem.attrib[name] = value.upper()
+    if first_child:
+        child = ET.Element(first_child[0])
+        child.text = first_child[1]
+        root.insert(0, child)  # written right after the root's text, without a tail
+    return root
+
+def canonical(xml: str) -> str:
+    return ET.canonicalize(xml, rewrite_prefixes=True)
+
+def test_namespaced_cda():
+    """Namespaces and prefixes are kept, xsi attributes are not sent, session_id is inserted without a namespace."""
+    output, batches = run(CDA, first_child=("session_id", "s1"))
+    assert output.startswith('<ClinicalDocument xmlns="urn:hl7-org:v3" xmlns:xsi=')
+    assert '<session_id xmlns="">s1</session_id>' in output
+    assert "<sdtc:deceasedInd" in output and 'xsi:type="CE"' in output
+    assert canonical(output) == canonical(ET.tostring(expected_tree(CDA, ("session_id", "s1")), encoding="unicode"))
+    sent = [value for batch in batches for value, _ in batch]
+    assert "CE" not in sent and "Eva" in sent and "tel:+49301234567" in sent
+    root = ET.fromstring(output)
+    assert root[0].tag == "session_id" and root[0].text == "s1"
+
+def test_tails_and_attributes():
+    """Element texts, tails and attribute values are each transformed in place."""
+    data = b'<p lang="de">Eva <b title="Name">und</b> Anna<br/> Tom</p>'
+    output, _ = run(data)
+    assert output == '<p lang="DE">EVA <b title="NAME">UND</b> ANNA<br></br> TOM</p>'
+
+def test_escaping():
+    """Transformed values are escaped for text and attribute context, including quotes and whitespace in attributes."""
+    data = b'<p note="a &amp; &quot;b&quot;&#10;c&#9;d">x &lt; y &amp; z &gt; 0</p>'
+    output, _ = run(data, transform=lambda value: value + ' <&"\n>')
+    root = ET.fromstring(output)
+    assert root.text == 'x < y & z > 0 <&"\n>'
+    assert root.attrib["note"] == 'a & "b"\nc\td <&"\n>'
+
+def test_batches_are_limited():
+    """Values are sent in batches limited by count; the output is unchanged by the batch size."""
+    data = b"<list>" + b"".join(b"<item>Name %d</item>" % i for i in range(30)) + b"</list>"
+    output, batches = run(data, max_items=4)
+    assert output == run(data)[0]
+    assert max(len(batch) for batch in batches) <= 4 and sum(len(batch) for batch in batches) == 30
+
+def test_round_trip_through_deanonymization(gateway_service):
+    """Anonymized XML with session_id deanonymizes back to the original document."""
+    tokens = {}
+
+    def tokenize(value):
+        return tokens.setdefault(value, f"anno_{len(tokens):08d}")
+
+    output, _ = run(CDA, transform=tokenize, first_child=("session_id", "s1"))
+    assert "Schmidt" not in output
+    originals = {token: value for value, token in tokens.items()}
+
+    def service(path, payload):
+        texts = payload["texts"]
+        for token, value in originals.items():
+            texts = [text.replace(token, value) for text in texts]
+        return {"deanonymized_texts": texts}
+
+    gateway_service(service)
+    root = ET.fromstring(output)
+    assert root[0].tag == "session_id"
+    root.remove(root[0])
+    restored = asyncio.run(routes.process_deanonymize_xml(root, "s1"))
+    assert canonical(restored) == canonical(CDA.decode("utf-8").split("?>", 1)[1].strip())